@@ -0,0 +1,98 @@
+import os
+
+# Byte budget for the process-wide DataFrame cache (default 2 GiB)
+DATAFRAME_CACHE_MAX_BYTES = int(os.getenv("DATAFRAME_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Rows parsed per chunk when ingesting uploads; bounds peak memory per upload
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+
+# Shared HTTP connection pool for the async OpenAI client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
+
+# Threads for blocking pandas/SQLite work done on behalf of async endpoints
+DATA_EXECUTOR_WORKERS = int(os.getenv("DATA_EXECUTOR_WORKERS", "4"))
+
+# Disk-backed cache of code-generation and narrative completions
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.db")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+
+# Pre-warmed worker processes for generated code (0 runs it in-process)
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+SANDBOX_JOB_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_JOB_TIMEOUT_SECONDS", "120"))
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "4096"))
+SANDBOX_MAX_JOBS_PER_WORKER = int(os.getenv("SANDBOX_MAX_JOBS_PER_WORKER", "200"))
+
+# Per-session variables created by generated code (per process)
+VARIABLE_STORE_MAX_BYTES = int(os.getenv("VARIABLE_STORE_MAX_BYTES", str(1024 ** 3)))
+VARIABLE_SESSION_TTL_SECONDS = int(os.getenv("VARIABLE_SESSION_TTL_SECONDS", "3600"))
+# Evicted DataFrames are spilled here as Arrow files; empty disables spilling
+VARIABLE_SPILL_DIR = os.getenv("VARIABLE_SPILL_DIR", "cache/spill")
+
+# Where datasets without an Arrow copy are published for sandbox workers
+# (defaults to /dev/shm when available)
+SHARED_DATASET_DIR = os.getenv("SHARED_DATASET_DIR", "")
+
+# "lite": JSON spec + small HTML shell sharing one cached plotly.js file;
+# "full": self-contained HTML with plotly.js embedded in every chart
+CHART_OUTPUT_MODE = os.getenv("CHART_OUTPUT_MODE", "lite")
+
+# Chart registry (creation / last-access times used for TTL cleanup)
+CHART_REGISTRY_PATH = os.getenv("CHART_REGISTRY_PATH", "cache/charts.db")
+# Chart access times are buffered in memory and written in one batch this often
+CHART_ACCESS_FLUSH_SECONDS = float(os.getenv("CHART_ACCESS_FLUSH_SECONDS", "5"))
+
+# Background chart garbage collection: charts unused for CHART_TTL_HOURS are
+# removed, at most CHART_GC_BATCH_SIZE expired charts and directory entries
+# per sweep
+CHART_TTL_HOURS = float(os.getenv("CHART_TTL_HOURS", "0.1"))
+CHART_GC_INTERVAL_SECONDS = int(os.getenv("CHART_GC_INTERVAL_SECONDS", "60"))
+CHART_GC_BATCH_SIZE = int(os.getenv("CHART_GC_BATCH_SIZE", "500"))
+# Chart references from chat messages are dropped after this long, letting
+# their charts expire (defaults to the session idle TTL)
+CHART_REFERENCE_TTL_SECONDS = int(os.getenv("CHART_REFERENCE_TTL_SECONDS", str(VARIABLE_SESSION_TTL_SECONDS)))
+
+# users.db access: pooled WAL-mode connections with prepared-statement caches
+DATABASE_PATH = os.getenv("DATABASE_PATH", "users.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+
+# Signed session tokens issued by /login. Set AUTH_TOKEN_SECRET in production;
+# without it a random per-process secret is used and tokens do not survive
+# restarts or work across workers
+AUTH_TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET", "")
+AUTH_TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", str(12 * 3600)))
+# Reject chat/upload requests without a token instead of trusting the body's username
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+# In-memory cache of user records, keyed by id
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+# Threads for bcrypt hashing and verification (deliberately slow)
+AUTH_EXECUTOR_WORKERS = int(os.getenv("AUTH_EXECUTOR_WORKERS", "2"))
+
+# Token budgets per LLM call (system prompt included); dataset descriptions
+# and analysis output are compacted to fit
+CODE_PROMPT_TOKEN_BUDGET = int(os.getenv("CODE_PROMPT_TOKEN_BUDGET", "4000"))
+NARRATIVE_TOKEN_BUDGET = int(os.getenv("NARRATIVE_TOKEN_BUDGET", "3000"))
+
+# Conversation history sent to the agent model: the last HISTORY_RECENT_TURNS
+# turns verbatim, older tool output cut to HISTORY_TOOL_SUMMARY_CHARS, and the
+# oldest turns dropped once over HISTORY_TOKEN_BUDGET
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_RECENT_TURNS = int(os.getenv("HISTORY_RECENT_TURNS", "2"))
+HISTORY_TOOL_SUMMARY_CHARS = int(os.getenv("HISTORY_TOOL_SUMMARY_CHARS", "300"))
+
+# LangGraph checkpoints for agent conversations, keyed by session (thread) id.
+# Shared by every worker process on the node, so any worker can resume a session
+AGENT_CHECKPOINT_PATH = os.getenv("AGENT_CHECKPOINT_PATH", "cache/agent_checkpoints.db")
+
+# Uploads are stored once per distinct content, under their SHA-256
+UPLOAD_BLOB_DIR = os.getenv("UPLOAD_BLOB_DIR", "uploads/blobs")
+
+# Results of generated code (stdout, charts, variables), keyed by normalized
+# code and the content of the data it reads; 0 disables. Per process, so each
+# sandbox worker keeps its own
+EXECUTION_CACHE_MAX_BYTES = int(os.getenv("EXECUTION_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
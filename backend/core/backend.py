@@ -1,82 +1,97 @@
 from langchain_core.messages import HumanMessage
 from typing import List
-from dataclasses import dataclass
-from langgraph.graph import StateGraph
-from backend.graph.state import AgentState, serialize_state
-from backend.graph.nodes import call_model, route_to_tools, tools
-from langgraph.prebuilt import ToolNode
+import uuid
 from backend.core.data_models import InputData, User
+from backend.core.db import connection
 import sqlite3
 from passlib.hash import bcrypt
 
 class PythonChatbot:
-    def __init__(self):
+    """One conversation with the agent, stored in the graph's checkpointer.
+
+    The chatbot only holds its session id; chat history, intermediate
+    outputs and chart paths are read back from the checkpoint, so a
+    conversation survives restarts and can continue in any worker.
+    """
+
+    def __init__(self, session_id: str = None):
         super().__init__()
-        self.reset_chat()
-        self.graph = self.create_graph()
-        
-    def create_graph(self):
-        workflow = StateGraph(AgentState)
-        workflow.add_node('agent', call_model)
-        workflow.add_node('tools', ToolNode(tools))
-
-        workflow.add_conditional_edges('agent', route_to_tools)
-
-        workflow.add_edge('tools', 'agent')
-        workflow.set_entry_point('agent')
-        return workflow.compile()
-    
+        # LangGraph is only needed by the agent; auth and upload import this module too
+        from backend.graph.workflow import agent_graph
+
+        self.graph = agent_graph.get()
+        self.session_id = session_id or uuid.uuid4().hex
+        self._values = None
+
+    @property
+    def config(self) -> dict:
+        return {"configurable": {"thread_id": self.session_id}, "recursion_limit": 25}
+
+    def _state(self) -> dict:
+        # Snapshot of the checkpoint, reloaded after each turn rather than on every read
+        if self._values is None:
+            self._values = self.graph.get_state(self.config).values or {}
+        return self._values
+
+    @property
+    def chat_history(self) -> list:
+        return list(self._state().get("messages", []))
+
+    @property
+    def intermediate_outputs(self) -> list:
+        return list(self._state().get("intermediate_outputs", []))
+
+    @property
+    def output_image_paths(self) -> dict:
+        return {int(k): v for k, v in self._state().get("message_image_paths", {}).items()}
+
     def user_sent_message(self, user_query, input_data: List[InputData]):
-        starting_image_paths_set = set(sum(self.output_image_paths.values(), []))
+        starting_image_paths_set = set(self._state().get("output_image_paths", []))
+        # Only the new message goes in; the checkpointer supplies the rest of the conversation
         input_state = {
-            "messages": self.chat_history + [HumanMessage(content=user_query)],
-            "output_image_paths": list(starting_image_paths_set),
+            "messages": [HumanMessage(content=user_query)],
             "input_data": input_data,
+            "session_id": self.session_id,
         }
 
-        # Don't serialize the entire state - let LangGraph handle it
-        # Only serialize specific parts if needed
-        result = self.graph.invoke(input_state, {"recursion_limit": 25})
-        self.chat_history = result["messages"]
+        result = self.graph.invoke(input_state, self.config)
         new_image_paths = set(result["output_image_paths"]) - starting_image_paths_set
-        self.output_image_paths[len(self.chat_history) - 1] = list(new_image_paths)
-        if "intermediate_outputs" in result:
-            self.intermediate_outputs.extend(result["intermediate_outputs"])
+        self.graph.update_state(self.config, {
+            "message_image_paths": {str(len(result["messages"]) - 1): list(new_image_paths)}
+        })
+        self._values = None
 
     def reset_chat(self):
-        self.chat_history = []
-        self.intermediate_outputs = []
-        self.output_image_paths = {}
-
-def get_db_connection():
-    conn = sqlite3.connect('users.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+        # Start a new thread; the old one stays in the checkpointer
+        self.session_id = uuid.uuid4().hex
+        self._values = None
 
 def create_user(username: str, password: str) -> bool:
     password_hash = bcrypt.hash(password)
-    conn = get_db_connection()
     try:
-        conn.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)', (username, password_hash))
-        conn.commit()
+        with connection() as conn:
+            conn.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)', (username, password_hash))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
-
-def authenticate_user(username: str, password: str) -> bool:
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-    conn.close()
-    if user and bcrypt.verify(password, user['password_hash']):
-        return True
-    return False
+
+def authenticate_user(username: str, password: str):
+    """Return the User if the password matches, else None (runs bcrypt; call off the event loop)"""
+    user = get_user_by_username(username)
+    if user and bcrypt.verify(password, user.password_hash):
+        return user
+    return None
 
 def get_user_by_username(username: str):
-    conn = get_db_connection()
-    user_row = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-    conn.close()
+    with connection() as conn:
+        user_row = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+    if user_row:
+        return User(id=user_row['id'], username=user_row['username'], password_hash=user_row['password_hash'])
+    return None
+
+def get_user_by_id(user_id: int):
+    with connection() as conn:
+        user_row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
     if user_row:
         return User(id=user_row['id'], username=user_row['username'], password_hash=user_row['password_hash'])
     return None
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: ingest is only serialized within a process
+    fcntl = None
+
+from backend.config import UPLOAD_BLOB_DIR
+from backend.core.columnar import columnar_path
+from backend.core.db import connection
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_BYTES = 1024 * 1024
+# Ingest locks, shared by hash prefix so their number stays fixed
+LOCK_STRIPES = 64
+LOCK_DIR = ".locks"
+
+
+class BlobStore:
+    """Uploaded files stored once under their SHA-256 content address.
+
+    Blobs live at <root>/<hash[:2]>/<hash>.csv, next to their Arrow copy.
+    The `blobs` table in users.db keeps each blob's ingest summary
+    (validation issues, preview, profile), so re-uploading known content
+    skips parsing, validation and profiling.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def path_for(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / f"{content_hash}.csv"
+
+    def receive(self, source):
+        """Stream source to a temporary file, hashing as it goes.
+
+        Returns (temp path, content hash, size in bytes).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_path = self.root / f"incoming_{uuid.uuid4().hex}.csv"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as sink:
+                for block in iter(lambda: source.read(READ_BLOCK_BYTES), b""):
+                    digest.update(block)
+                    sink.write(block)
+                    size += len(block)
+        except BaseException:
+            self.discard(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    @contextmanager
+    def lock(self, content_hash: str):
+        """Serialize ingest of the same content across threads and workers.
+
+        The thread lock orders callers within this process; the lock file
+        orders processes (e.g. several uvicorn workers) sharing the store.
+        """
+        stripe = int(content_hash[:8], 16) % LOCK_STRIPES
+        with self._locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            lock_dir = self.root / LOCK_DIR
+            lock_dir.mkdir(parents=True, exist_ok=True)
+            with open(lock_dir / f"{stripe:02d}.lock", "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def lookup(self, content_hash: str):
+        """Ingest summary of a stored blob, or None if the content is new"""
+        with connection() as conn:
+            row = conn.execute("SELECT summary FROM blobs WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        if not self.path_for(content_hash).exists():
+            # Row outlived its file; ingest again
+            logger.warning(f"Blob {content_hash} is recorded but missing on disk")
+            return None
+        return json.loads(row[0])
+
+    def store(self, temp_path, content_hash: str) -> Path:
+        """Move a received file to its content address"""
+        path = self.path_for(content_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, path)
+        return path
+
+    def record(self, content_hash: str, size: int, summary: dict):
+        with connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO blobs (content_hash, path, size, summary) VALUES (?, ?, ?, ?)",
+                (content_hash, str(self.path_for(content_hash)), size, json.dumps(summary, default=str))
+            )
+
+    def remove(self, content_hash: str):
+        """Delete a blob whose ingest failed, with its Arrow copy"""
+        path = self.path_for(content_hash)
+        for p in (path, columnar_path(path)):
+            self.discard(p)
+
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+blob_store = BlobStore(UPLOAD_BLOB_DIR)
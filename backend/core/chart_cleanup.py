@@ -1,97 +1,272 @@
+import json
+import logging
 import os
+import threading
 import time
-from datetime import datetime, timedelta
-import json
-from pathlib import Path
+from datetime import datetime
+
+from backend.config import CHART_ACCESS_FLUSH_SECONDS, CHART_REGISTRY_PATH, CHART_TTL_HOURS
+from backend.core.db import ConnectionPool
+from backend.core.precompress import VARIANT_SUFFIXES, base_name
+
+logger = logging.getLogger(__name__)
 
 CHARTS_DIR = "images/plotly_figures/html"
-METADATA_FILE = "images/plotly_figures/metadata.json"
-DEFAULT_TTL_HOURS = 0.1  # Time to live in hours
+SPECS_DIR = "images/plotly_figures/specs"
+LEGACY_METADATA_FILE = "images/plotly_figures/metadata.json"
+DEFAULT_TTL_HOURS = CHART_TTL_HOURS  # Time to live in hours
+# Files younger than this are never treated as orphans; they may be written
+# before their registry row is
+ORPHAN_GRACE_SECONDS = 60
+_LOOKUP_BATCH = 500
 
 def ensure_dirs():
     """Ensure necessary directories exist"""
     os.makedirs(CHARTS_DIR, exist_ok=True)
-    os.makedirs(os.path.dirname(METADATA_FILE), exist_ok=True)
-
-def load_metadata():
-    """Load chart metadata from file"""
-    if not os.path.exists(METADATA_FILE):
-        return {}
-    try:
-        with open(METADATA_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
-
-def save_metadata(metadata):
-    """Save chart metadata to file"""
-    with open(METADATA_FILE, 'w') as f:
-        json.dump(metadata, f)
+    os.makedirs(SPECS_DIR, exist_ok=True)
+
+def remove_chart_files(filename):
+    """Remove a chart, its JSON spec and their precompressed copies, if any"""
+    spec_path = os.path.join(SPECS_DIR, f"{os.path.splitext(filename)[0]}.json")
+    for path in (os.path.join(CHARTS_DIR, filename), spec_path):
+        for suffix in ("", *VARIANT_SUFFIXES.values()):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass  # Ignore errors during deletion
+
+
+class ChartRegistry:
+    """SQLite table of charts with their creation and last-access times.
+
+    Shared by the API process and sandbox workers. last_accessed is indexed
+    so TTL cleanup is a range scan. Access times are only buffered in memory
+    by record_access; flush writes them in one batch and is run every
+    flush_seconds by the chart collector.
+
+    Charts are content-addressed, so one file can belong to several chat
+    messages. chart_refs records which (session, message) pairs point at each
+    chart; a chart only expires once it has no references left.
+    """
+
+    def __init__(self, path: str, flush_seconds: float):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._pending = {}  # filename -> last access time not yet written
+        self._lock = threading.Lock()
+        self._pool = ConnectionPool(path, setup=self._create_tables)
+
+    def _create_tables(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS charts ("
+            "filename TEXT PRIMARY KEY, created_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_charts_last_accessed ON charts(last_accessed)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chart_refs ("
+            "filename TEXT NOT NULL, session_id TEXT NOT NULL, message_id TEXT NOT NULL, "
+            "referenced_at REAL NOT NULL, PRIMARY KEY (filename, session_id, message_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chart_refs_referenced_at ON chart_refs(referenced_at)")
+        self._import_legacy_metadata(conn)
+        conn.commit()
+
+    def _import_legacy_metadata(self, conn):
+        # One-time move of the old metadata.json into the table
+        if not os.path.exists(LEGACY_METADATA_FILE):
+            return
+        try:
+            with open(LEGACY_METADATA_FILE) as f:
+                text = f.read()
+        except OSError as e:
+            logger.info(f"Could not import {LEGACY_METADATA_FILE}: {e}")
+            return
+        try:
+            metadata = json.loads(text) if text.strip() else {}
+            if not isinstance(metadata, dict):
+                raise ValueError(f"expected an object, got {type(metadata).__name__}")
+        except ValueError as e:
+            # Nothing usable to import; set the file aside so this is reported once
+            logger.warning(f"Ignoring unreadable {LEGACY_METADATA_FILE} ({e}); renamed to {LEGACY_METADATA_FILE}.invalid")
+            os.replace(LEGACY_METADATA_FILE, f"{LEGACY_METADATA_FILE}.invalid")
+            return
+        rows = []
+        for filename, data in metadata.items():
+            try:
+                created = datetime.fromisoformat(data['created_at']).timestamp()
+                accessed = datetime.fromisoformat(data['last_accessed']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                created = accessed = 0.0  # Unparseable: expire on the next sweep
+            rows.append((filename, created, accessed))
+        conn.executemany("INSERT OR IGNORE INTO charts VALUES (?, ?, ?)", rows)
+        os.remove(LEGACY_METADATA_FILE)
+
+    def record_creation(self, filename: str):
+        """Register a chart, or mark an existing one as just used"""
+        now = time.time()
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO charts (filename, created_at, last_accessed) VALUES (?, ?, ?) "
+                "ON CONFLICT(filename) DO UPDATE SET last_accessed = excluded.last_accessed",
+                (filename, now, now)
+            )
+
+    def record_access(self, filename: str):
+        """Buffer an access; cheap enough to call on every chart request"""
+        with self._lock:
+            self._pending[filename] = time.time()
+
+    def flush(self):
+        """Write buffered access times"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+        with self._pool.connection() as conn:
+            # Only ever move last_accessed forward
+            conn.executemany(
+                "UPDATE charts SET last_accessed = MAX(last_accessed, ?) WHERE filename = ?",
+                [(accessed, filename) for filename, accessed in pending.items()]
+            )
+
+    def add_references(self, filenames, session_id: str, message_id: str):
+        """Record that a chat message in session_id shows these charts"""
+        now = time.time()
+        with self._pool.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chart_refs (filename, session_id, message_id, referenced_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(filename, session_id, message_id, now) for filename in filenames]
+            )
+
+    def release_session(self, session_id: str) -> int:
+        """Drop all of a session's chart references"""
+        with self._pool.connection() as conn:
+            return conn.execute("DELETE FROM chart_refs WHERE session_id = ?", (session_id,)).rowcount
+
+    def prune_references(self, cutoff: float, limit: int = None) -> int:
+        """Drop references made before cutoff; their sessions have gone idle"""
+        query = "SELECT rowid FROM chart_refs WHERE referenced_at < ? ORDER BY referenced_at"
+        params = (cutoff,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._pool.connection() as conn:
+            rowids = [(row[0],) for row in conn.execute(query, params)]
+            conn.executemany("DELETE FROM chart_refs WHERE rowid = ?", rowids)
+        return len(rowids)
+
+    def expired(self, cutoff: float, limit: int = None) -> list:
+        """Unreferenced charts last accessed before cutoff (epoch seconds), oldest first"""
+        self.flush()
+        query = (
+            "SELECT filename FROM charts WHERE last_accessed < ? "
+            "AND NOT EXISTS (SELECT 1 FROM chart_refs r WHERE r.filename = charts.filename) "
+            "ORDER BY last_accessed"
+        )
+        params = (cutoff,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._pool.connection() as conn:
+            return [row[0] for row in conn.execute(query, params)]
+
+    def known(self, filenames) -> set:
+        """The subset of filenames that have registry rows"""
+        filenames = list(filenames)
+        found = set()
+        with self._pool.connection() as conn:
+            for i in range(0, len(filenames), _LOOKUP_BATCH):
+                batch = filenames[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    row[0] for row in
+                    conn.execute(f"SELECT filename FROM charts WHERE filename IN ({placeholders})", batch)
+                )
+        return found
+
+    def remove(self, filenames, cutoff: float = None) -> list:
+        """Delete registry rows and return the filenames actually removed.
+
+        With a cutoff, rows touched or referenced since it are kept, so a chart
+        reused while a sweep is running survives it.
+        """
+        removed = []
+        with self._pool.connection() as conn:
+            for filename in filenames:
+                if cutoff is None:
+                    conn.execute("DELETE FROM chart_refs WHERE filename = ?", (filename,))
+                    deleted = conn.execute("DELETE FROM charts WHERE filename = ?", (filename,)).rowcount
+                else:
+                    deleted = conn.execute(
+                        "DELETE FROM charts WHERE filename = ? AND last_accessed < ? "
+                        "AND NOT EXISTS (SELECT 1 FROM chart_refs r WHERE r.filename = charts.filename)",
+                        (filename, cutoff)
+                    ).rowcount
+                if deleted or cutoff is None:
+                    removed.append(filename)
+        with self._lock:
+            for filename in removed:
+                self._pending.pop(filename, None)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM chart_refs")
+            conn.execute("DELETE FROM charts")
+
+    def stats(self) -> dict:
+        with self._pool.connection() as conn:
+            charts = conn.execute("SELECT COUNT(*) FROM charts").fetchone()[0]
+            references = conn.execute("SELECT COUNT(*) FROM chart_refs").fetchone()[0]
+        return {"charts": charts, "references": references}
+
+
+os.makedirs(os.path.dirname(CHART_REGISTRY_PATH) or ".", exist_ok=True)
+chart_registry = ChartRegistry(CHART_REGISTRY_PATH, CHART_ACCESS_FLUSH_SECONDS)
 
 def record_chart_creation(filename):
     """Record when a chart is created"""
-    metadata = load_metadata()
-    metadata[filename] = {
-        'created_at': datetime.now().isoformat(),
-        'last_accessed': datetime.now().isoformat()
-    }
-    save_metadata(metadata)
+    chart_registry.record_creation(filename)
 
 def record_chart_access(filename):
-    """Record when a chart is accessed"""
-    metadata = load_metadata()
-    if filename in metadata:
-        metadata[filename]['last_accessed'] = datetime.now().isoformat()
-        save_metadata(metadata)
-
-def cleanup_old_charts(ttl_hours=DEFAULT_TTL_HOURS):
-    """Remove charts that haven't been accessed in ttl_hours"""
+    """Record when a chart is accessed (buffered)"""
+    chart_registry.record_access(filename)
+
+def cleanup_old_charts(ttl_hours=DEFAULT_TTL_HOURS, limit=None):
+    """Remove charts that haven't been accessed in ttl_hours (at most limit of them)"""
     ensure_dirs()
-    metadata = load_metadata()
-    current_time = datetime.now()
-    files_to_delete = []
-    updated_metadata = {}
+    cutoff = time.time() - ttl_hours * 3600
+    expired = chart_registry.expired(cutoff, limit=limit)
+    # Rows go first: a chart touched since the query keeps its row and files
+    removed = chart_registry.remove(expired, cutoff=cutoff)
+    for filename in removed:
+        remove_chart_files(filename)
+    return len(removed)
 
-    # Identify files to delete
-    for filename, data in metadata.items():
+def remove_orphans(entries):
+    """Remove the given chart directory entries that have no registry row"""
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    candidates = []
+    for entry in entries:
         try:
-            last_accessed = datetime.fromisoformat(data['last_accessed'])
-            if current_time - last_accessed > timedelta(hours=ttl_hours):
-                file_path = os.path.join(CHARTS_DIR, filename)
-                if os.path.exists(file_path):
-                    files_to_delete.append(file_path)
-            else:
-                updated_metadata[filename] = data
-        except:
-            # If there's any error parsing dates, consider the file for deletion
-            file_path = os.path.join(CHARTS_DIR, filename)
-            if os.path.exists(file_path):
-                files_to_delete.append(file_path)
-
-    # Delete files
-    for file_path in files_to_delete:
-        try:
-            os.remove(file_path)
-        except:
-            pass  # Ignore errors during deletion
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                candidates.append(entry.name)
+        except FileNotFoundError:
+            continue
+    # Precompressed copies belong to their base file
+    known = chart_registry.known({base_name(name) for name in candidates})
+    orphaned_files = {name for name in candidates if base_name(name) not in known}
 
-    # Update metadata file
-    save_metadata(updated_metadata)
+    for filename in {base_name(name) for name in orphaned_files}:
+        remove_chart_files(filename)
 
-    return len(files_to_delete)
+    return len(orphaned_files)
 
 def cleanup_orphaned_files():
-    """Remove any files that don't have metadata entries"""
-    metadata = load_metadata()
-    known_files = set(metadata.keys())
-    
-    actual_files = set(os.listdir(CHARTS_DIR))
-    orphaned_files = actual_files - known_files
-
-    for filename in orphaned_files:
-        try:
-            os.remove(os.path.join(CHARTS_DIR, filename))
-        except:
-            pass  # Ignore errors during deletion
-
-    return len(orphaned_files)
+    """Remove any files that don't have registry entries"""
+    ensure_dirs()
+    with os.scandir(CHARTS_DIR) as entries:
+        return remove_orphans(list(entries))
@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+import time
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from backend.config import CHART_GC_BATCH_SIZE, CHART_GC_INTERVAL_SECONDS, CHART_REFERENCE_TTL_SECONDS, CHART_TTL_HOURS
+from backend.core.chart_cleanup import CHARTS_DIR, chart_registry, cleanup_old_charts, ensure_dirs, remove_orphans
+
+logger = logging.getLogger(__name__)
+
+
+class ChartCollector:
+    """Removes expired and orphaned charts off the request path.
+
+    Each sweep drops at most batch_size stale chart references, deletes at
+    most batch_size expired charts and checks at most batch_size entries of
+    the chart directory for orphans. The directory scan resumes where the
+    previous sweep stopped, so no sweep's cost grows with the total number of
+    charts.
+    """
+
+    def __init__(self, interval_seconds: int, batch_size: int, ttl_hours: float, reference_ttl_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.ttl_hours = ttl_hours
+        self.reference_ttl_seconds = reference_ttl_seconds
+        self._scan = None  # os.scandir iterator carried across sweeps
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self.sweeps = 0
+        self.total_expired = 0
+        self.total_orphaned = 0
+        self.last_sweep = None
+
+    def sweep(self) -> dict:
+        """Run one bounded sweep and return its stats"""
+        with self._lock:
+            started = time.time()
+            error = None
+            pruned = expired = orphaned = scanned = 0
+            try:
+                ensure_dirs()
+                pruned = chart_registry.prune_references(started - self.reference_ttl_seconds, limit=self.batch_size)
+                expired = cleanup_old_charts(self.ttl_hours, limit=self.batch_size)
+                entries = self._next_entries()
+                scanned = len(entries)
+                orphaned = remove_orphans(entries)
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Chart cleanup sweep failed: {e}")
+            self.sweeps += 1
+            self.total_expired += expired
+            self.total_orphaned += orphaned
+            self.last_sweep = {
+                "started_at": started,
+                "duration_ms": round((time.time() - started) * 1000, 1),
+                "references_pruned": pruned,
+                "expired_removed": expired,
+                "orphans_removed": orphaned,
+                "entries_scanned": scanned,
+                # A full batch means there is likely more work for the next sweep
+                "backlog": expired >= self.batch_size or pruned >= self.batch_size,
+                "error": error,
+            }
+            return self.last_sweep
+
+    def _next_entries(self) -> list:
+        entries = []
+        passes = 0
+        while len(entries) < self.batch_size:
+            if self._scan is None:
+                if entries or passes:
+                    # Start the next pass on the next sweep; an empty
+                    # directory would otherwise be rescanned forever
+                    break
+                self._scan = os.scandir(CHARTS_DIR)
+                passes += 1
+            entry = next(self._scan, None)
+            if entry is None:
+                self._scan.close()
+                self._scan = None
+                continue
+            entries.append(entry)
+        return entries
+
+    def start(self):
+        """Schedule sweeps and access-time flushes on a background thread (idempotent)"""
+        if self._scheduler is not None or self.interval_seconds <= 0:
+            return
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self.sweep, "interval", seconds=self.interval_seconds,
+            id="chart_gc", max_instances=1, coalesce=True,
+        )
+        # Access times recorded by the chart route are written in batches
+        self._scheduler.add_job(
+            chart_registry.flush, "interval", seconds=chart_registry.flush_seconds,
+            id="chart_access_flush", max_instances=1, coalesce=True,
+        )
+        self._scheduler.start()
+        logger.info(f"Chart cleanup scheduled every {self.interval_seconds}s")
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+        with self._lock:
+            if self._scan is not None:
+                self._scan.close()
+                self._scan = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._scheduler is not None,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "ttl_hours": self.ttl_hours,
+            "reference_ttl_seconds": self.reference_ttl_seconds,
+            "sweeps": self.sweeps,
+            "total_expired_removed": self.total_expired,
+            "total_orphans_removed": self.total_orphaned,
+            "last_sweep": self.last_sweep,
+        }
+
+
+chart_collector = ChartCollector(
+    CHART_GC_INTERVAL_SECONDS, CHART_GC_BATCH_SIZE, CHART_TTL_HOURS, CHART_REFERENCE_TTL_SECONDS
+)
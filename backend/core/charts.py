@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+
+from backend.config import CHART_OUTPUT_MODE
+from backend.core.chart_cleanup import CHARTS_DIR, SPECS_DIR, record_chart_creation
+
+ASSETS_DIR = "images/plotly_figures/assets"
+ASSET_URL_PREFIX = "/api/charts/assets"
+
+# plotly.js dtype codes for typed arrays (there is no 64-bit integer type)
+_TYPED_ARRAY_CODES = {
+    np.dtype("float64"): "f8",
+    np.dtype("float32"): "f4",
+    np.dtype("int32"): "i4",
+    np.dtype("uint32"): "u4",
+    np.dtype("int16"): "i2",
+    np.dtype("uint16"): "u2",
+    np.dtype("int8"): "i1",
+    np.dtype("uint8"): "u1",
+}
+# Shorter numeric arrays are left as plain JSON lists
+MIN_TYPED_ARRAY_LENGTH = 8
+
+_LITE_HTML = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><script src="{script_url}"></script></head>
+<body style="margin:0">
+<div id="chart" style="width:100%;height:100vh"></div>
+<script>
+var spec = {spec};
+Plotly.newPlot("chart", spec.data, spec.layout || {{}}, {{responsive: true}});
+</script>
+</body>
+</html>
+"""
+
+_plotly_js_filename = None
+
+
+def plotly_js_filename() -> str:
+    """Write the bundled plotly.js once per version and return its file name"""
+    global _plotly_js_filename
+    if _plotly_js_filename is None:
+        name = f"plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+        path = os.path.join(ASSETS_DIR, name)
+        if not os.path.exists(path):
+            os.makedirs(ASSETS_DIR, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(plotly.offline.get_plotlyjs())
+            os.replace(tmp_path, path)
+        _plotly_js_filename = name
+    return _plotly_js_filename
+
+
+def _supports_typed_arrays() -> bool:
+    # Typed-array specs ({dtype, bdata}) were added in plotly.js 2.28
+    major, minor = (int(part) for part in plotly.offline.get_plotlyjs_version().split(".")[:2])
+    return (major, minor) >= (2, 28)
+
+
+def _encode_array(value: np.ndarray):
+    if value.dtype == np.int64 or value.dtype == np.uint64:
+        fits = value.size == 0 or (value.min() >= np.iinfo(np.int32).min and value.max() <= np.iinfo(np.int32).max)
+        value = value.astype(np.int32 if fits else np.float64)
+    code = _TYPED_ARRAY_CODES.get(value.dtype)
+    if code is None or value.size < MIN_TYPED_ARRAY_LENGTH:
+        return value
+    encoded = {"dtype": code, "bdata": base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii")}
+    if value.ndim > 1:
+        encoded["shape"] = ",".join(str(n) for n in value.shape)
+    return encoded
+
+
+def _encode_typed_arrays(node):
+    # plotly.js only decodes a typed-array spec that is an attribute's whole
+    # value, so arrays nested in lists (heatmap z given as rows, table cell
+    # values) are left alone; lists are only searched for objects
+    if isinstance(node, dict):
+        return {k: _encode_typed_arrays(v) for k, v in node.items()}
+    if isinstance(node, np.ndarray):
+        return _encode_array(node) if node.dtype.kind in "iuf" else node
+    if isinstance(node, (list, tuple)):
+        if len(node) >= MIN_TYPED_ARRAY_LENGTH and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in node
+        ):
+            return _encode_array(np.asarray(node))
+        return [_encode_typed_arrays(v) if isinstance(v, dict) else v for v in node]
+    return node
+
+
+def figure_spec_json(figure) -> str:
+    """Serialize a figure to its JSON spec, base64-encoding numeric arrays"""
+    spec = figure.to_plotly_json() if hasattr(figure, "to_plotly_json") else figure
+    spec = {"data": spec.get("data", []), "layout": spec.get("layout", {})}
+    if _supports_typed_arrays():
+        spec = _encode_typed_arrays(spec)
+    # Sorted keys make the spec canonical, so equal figures hash equally
+    return json.dumps(spec, cls=PlotlyJSONEncoder, sort_keys=True)
+
+
+def chart_id_for(spec_json: str) -> str:
+    """Content address of a chart: its spec plus everything else baked into the file"""
+    digest = hashlib.sha256()
+    for part in (CHART_OUTPUT_MODE, plotly.offline.get_plotlyjs_version(), spec_json):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def _write_atomic(path: str, content: str):
+    # Concurrent writers of the same chart produce identical bytes; replace
+    # keeps readers from ever seeing a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def save_figures(figures) -> list:
+    """Save figures to the chart directory and return their HTML file names.
+
+    Charts are named by a hash of their canonical spec, so a figure that was
+    already saved costs no writes. In "lite" mode each chart is a small HTML
+    shell plus a JSON spec, both pointing at one shared, long-cached
+    plotly.js file. "full" mode keeps the old self-contained HTML with
+    plotly.js embedded.
+    """
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+    os.makedirs(SPECS_DIR, exist_ok=True)
+    output_image_paths = []
+    for figure in figures:
+        spec_json = figure_spec_json(figure)
+        chart_id = chart_id_for(spec_json)
+        html_filename = f"{chart_id}.html"
+        filepath = os.path.join(CHARTS_DIR, html_filename)
+        spec_path = os.path.join(SPECS_DIR, f"{chart_id}.json")
+        # Touch the registry first so the collector does not expire a chart
+        # that is being reused
+        record_chart_creation(html_filename)
+        if CHART_OUTPUT_MODE == "full":
+            if not os.path.exists(filepath):
+                tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp.html"
+                plotly.offline.plot(figure, filename=tmp_path, auto_open=False)
+                os.replace(tmp_path, filepath)
+        elif not (os.path.exists(filepath) and os.path.exists(spec_path)):
+            _write_atomic(spec_path, spec_json)
+            script_url = f"{ASSET_URL_PREFIX}/{plotly_js_filename()}"
+            # Keep "</script>" inside string values from closing the tag early
+            _write_atomic(filepath, _LITE_HTML.format(script_url=script_url, spec=spec_json.replace("</", "<\\/")))
+        output_image_paths.append(html_filename)
+    return output_image_paths
+
+
+def load_chart_spec(html_filename: str):
+    """Return the stored JSON spec for a chart, or None (e.g. full-mode charts)"""
+    chart_id = os.path.splitext(os.path.basename(html_filename))[0]
+    try:
+        with open(os.path.join(SPECS_DIR, f"{chart_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
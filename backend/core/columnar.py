@@ -0,0 +1,126 @@
+import logging
+import os
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_SUFFIX = ".arrow"
+
+
+def columnar_path(csv_path) -> Path:
+    """Return the path of the Arrow IPC copy that sits next to a CSV upload"""
+    return Path(csv_path).with_suffix(COLUMNAR_SUFFIX)
+
+
+def temp_path_for(path: Path) -> Path:
+    """A unique sibling of path, so concurrent writers never share a file"""
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def has_columnar_copy(csv_path) -> bool:
+    """True if an Arrow copy exists and is at least as new as the CSV"""
+    arrow_path = columnar_path(csv_path)
+    if not arrow_path.exists():
+        return False
+    try:
+        return arrow_path.stat().st_mtime_ns >= Path(csv_path).stat().st_mtime_ns
+    except FileNotFoundError:
+        # CSV is gone but the typed copy is still usable
+        return True
+
+
+def write_columnar_copy(df: pd.DataFrame, csv_path):
+    """Write a typed, uncompressed Arrow IPC copy of df next to csv_path.
+
+    Uncompressed IPC files can be memory-mapped, so readers only page in the
+    columns they touch. Returns the written path, or None if the frame could
+    not be converted (e.g. columns holding mixed Python objects).
+    """
+    arrow_path = columnar_path(csv_path)
+    tmp_path = temp_path_for(arrow_path)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, arrow_path)
+        return arrow_path
+    except Exception as e:
+        logger.warning(f"Could not write columnar copy for {csv_path}: {e}")
+        if tmp_path.exists():
+            os.remove(tmp_path)
+        return None
+
+
+def read_columns(csv_path) -> list:
+    """Return the column names of a dataset without loading any rows"""
+    if has_columnar_copy(csv_path):
+        with pa.memory_map(str(columnar_path(csv_path)), "r") as source:
+            return pa.ipc.open_file(source).schema.names
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+
+def load_dataset(csv_path, columns=None) -> pd.DataFrame:
+    """Load a dataset, preferring its memory-mapped Arrow copy over the CSV.
+
+    Pass columns to read only the columns that are needed.
+    """
+    if has_columnar_copy(csv_path):
+        try:
+            return feather.read_feather(columnar_path(csv_path), columns=columns, memory_map=True)
+        except Exception as e:
+            logger.warning(f"Falling back to CSV for {csv_path}: {e}")
+    return pd.read_csv(csv_path, usecols=columns)
+
+
+class ColumnarWriter:
+    """Append DataFrame chunks to the Arrow IPC copy of a CSV.
+
+    The schema is taken from the first chunk. If a later chunk cannot be
+    converted to it the copy is abandoned and readers fall back to the CSV.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = columnar_path(csv_path)
+        self.tmp_path = temp_path_for(self.path)
+        self.failed = False
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        if self.failed:
+            return
+        try:
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pa.ipc.new_file(str(self.tmp_path), self._schema)
+            self._writer.write_table(table)
+        except Exception as e:
+            logger.warning(f"Abandoning columnar copy for {self.csv_path}: {e}")
+            self.abort()
+
+    def close(self):
+        """Finish the copy and move it into place; returns its path or None"""
+        if self.failed or self._writer is None:
+            self.abort()
+            return None
+        self._writer.close()
+        self._writer = None
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        self.failed = True
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+        if self.tmp_path.exists():
+            os.remove(self.tmp_path)
@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend.config import DATAFRAME_CACHE_MAX_BYTES
+from backend.core.columnar import columnar_path, has_columnar_copy, load_dataset
+
+logger = logging.getLogger(__name__)
+
+def enable_copy_on_write():
+    """Turn on pandas copy-on-write in this process; called at app and sandbox worker startup.
+
+    Cached frames are handed to several requests at once; copy-on-write keeps
+    one request's column assignments from leaking into the shared frame.
+    pandas 3 always behaves this way and deprecates the option.
+    """
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def file_identity(path) -> tuple:
+    """Identify a dataset by the path, size and mtime of the file actually read"""
+    source = columnar_path(path) if has_columnar_copy(path) else path
+    stat = os.stat(source)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class DataFrameCache:
+    """LRU cache of loaded DataFrames bounded by their in-memory byte size"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path) -> pd.DataFrame:
+        """Return the DataFrame for path, loading it on a miss"""
+        key = file_identity(path)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        df = load_dataset(path)
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if key not in self._frames:
+                self._store(key, df, size)
+        return df
+
+    def _store(self, key, df, size):
+        if size > self.max_bytes:
+            logger.info(f"Not caching {key[0]}: {size} bytes exceeds the cache budget")
+            return
+        # Drop older versions of the same file before making room
+        for stale in [k for k in self._frames if k[0] == key[0]]:
+            self._remove(stale)
+        while self._frames and self.current_bytes + size > self.max_bytes:
+            oldest = next(iter(self._frames))
+            self._remove(oldest)
+            self.evictions += 1
+        self._frames[key] = (df, size)
+        self.current_bytes += size
+
+    def _remove(self, key):
+        _, size = self._frames.pop(key)
+        self.current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._frames),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+dataframe_cache = DataFrameCache(DATAFRAME_CACHE_MAX_BYTES)
+
+
+def get_dataframe(path) -> pd.DataFrame:
+    """Load a dataset through the process-wide cache"""
+    return dataframe_cache.get(path)
+
+
+def file_sha256(path, block_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
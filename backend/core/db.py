@@ -0,0 +1,176 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from backend.config import DATABASE_PATH, DB_BUSY_TIMEOUT_MS, DB_POOL_SIZE, DB_STATEMENT_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Schema of users.db as (version, description, statements). Applied in order
+# and recorded in PRAGMA user_version; append new migrations, never edit old ones.
+MIGRATIONS = [
+    (1, "users and files tables", [
+        """CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            filepath TEXT NOT NULL,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (2, "per-upload column profiles", [
+        """CREATE TABLE IF NOT EXISTS file_profiles (
+            file_id INTEGER PRIMARY KEY REFERENCES files(id),
+            profile TEXT NOT NULL
+        )""",
+    ]),
+    (3, "index for a user's latest upload", [
+        "CREATE INDEX IF NOT EXISTS idx_files_username_uploaded_at ON files(username, uploaded_at)",
+        "CREATE INDEX IF NOT EXISTS idx_files_filepath ON files(filepath)",
+    ]),
+    (4, "content-addressed upload blobs", [
+        """CREATE TABLE IF NOT EXISTS blobs (
+            content_hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            summary TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "ALTER TABLE files ADD COLUMN content_hash TEXT REFERENCES blobs(content_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash)",
+    ]),
+]
+
+
+def migrate(conn, migrations=MIGRATIONS) -> int:
+    """Apply pending migrations and return the resulting schema version"""
+    for number, description, statements in migrations:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+            continue
+        # IMMEDIATE takes the write lock, so concurrent processes migrate once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < number:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(number)}")
+                logger.info(f"Applied migration {number}: {description}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections in WAL mode.
+
+    WAL lets readers run alongside a writer; busy_timeout makes writers wait
+    for each other instead of failing. Connections are reused, so each keeps
+    its cache of prepared statements. setup runs once on the first connection
+    a process opens (schema creation, migrations). Pools notice a fork and
+    start over rather than share connections with the parent.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE, busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS,
+                 cached_statements: int = DB_STATEMENT_CACHE_SIZE, setup=None):
+        self.path = path
+        self.size = max(1, size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.setup = setup
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._ready = False
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,  # Pooled connections move between threads
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._created < self.size:
+                conn = self._open()
+                self._created += 1
+                if not self._ready:
+                    try:
+                        if self.setup is not None:
+                            self.setup(conn)
+                    except BaseException:
+                        conn.close()
+                        self._created -= 1
+                        raise
+                    self._ready = True
+                return conn
+        try:
+            return self._idle.get(timeout=self.busy_timeout_ms / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+
+    def _release(self, conn):
+        if self._pid != os.getpid():
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on a clean exit and rolls back on errors"""
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "open": self._created, "idle": self._idle.qsize()}
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._reset()
+
+
+database = ConnectionPool(DATABASE_PATH, setup=migrate)
+
+
+def connection():
+    """Borrow a connection to users.db (see ConnectionPool.connection)"""
+    return database.connection()
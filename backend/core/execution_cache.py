@@ -0,0 +1,148 @@
+import ast
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend.config import EXECUTION_CACHE_MAX_BYTES
+from backend.core.chart_cleanup import CHARTS_DIR
+from backend.core.dataframe_cache import file_identity, file_sha256
+from backend.core.variable_store import referenced_names, sizeof, value_fingerprint, variable_store
+
+
+def normalize_code(python_code: str):
+    """Code with comments, formatting and line numbers removed, or None if it does not parse"""
+    try:
+        return ast.dump(ast.parse(python_code))
+    except SyntaxError:
+        return None
+
+
+_dataset_hashes = {}  # file identity -> sha256
+_dataset_hashes_lock = threading.Lock()
+
+
+def dataset_hash(source) -> str:
+    """Content hash of an input dataset, given its path or shared-dataset handle"""
+    path = source["identity"][0] if isinstance(source, dict) else source
+    identity = file_identity(path)
+    with _dataset_hashes_lock:
+        cached = _dataset_hashes.get(identity)
+    if cached is None:
+        cached = file_sha256(path)
+        with _dataset_hashes_lock:
+            _dataset_hashes[identity] = cached
+    return cached
+
+
+def execution_key(python_code: str, inputs: list, variables: dict, session_id: str):
+    """Cache key for running python_code in a session, or None if it cannot be cached"""
+    normalized = normalize_code(python_code)
+    if normalized is None:
+        return None
+    names = referenced_names(python_code)
+    input_names = {name for name, _ in inputs}
+    datasets = {name: dataset_hash(source) for name, source in inputs if name in names}
+    # Same precedence as execution: inputs, then passed variables, then the session's
+    fingerprints = {
+        name: value_fingerprint(value) for name, value in variables.items()
+        if name in names and name not in input_names
+    }
+    session_names = names - input_names - set(variables)
+    fingerprints.update(variable_store.fingerprints(session_id, session_names))
+    return ExecutionCache.key(normalized, datasets, fingerprints)
+
+
+class _Result:
+    def __init__(self, output, chart_paths, variables, size):
+        self.output = output
+        self.chart_paths = chart_paths
+        self.variables = variables
+        self.size = size
+
+
+class ExecutionCache:
+    """Results of generated code, keyed by what the code can observe.
+
+    The key is the AST-normalized code plus the content hashes of the input
+    datasets and of the session variables it reads, so the same analysis on
+    unchanged data is not run again. A result holds the captured stdout, the
+    chart files produced and the variables the code left behind. Entries are
+    evicted least recently used once their total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> _Result, LRU first
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(normalized_code: str, datasets: dict, variables: dict) -> str:
+        """datasets and variables map names to content hashes"""
+        payload = json.dumps([normalized_code, datasets, variables], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Cached result for key, or None; a result whose charts were collected is dropped"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None and not all(
+                os.path.exists(os.path.join(CHARTS_DIR, name)) for name in result.chart_paths
+            ):
+                self._remove(key)
+                result = None
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, output: str, chart_paths: list, variables: dict):
+        # The session keeps using (and may change in place) the live objects;
+        # keep copy-on-write snapshots of frames instead
+        variables = {
+            k: v.copy(deep=False) if isinstance(v, (pd.DataFrame, pd.Series)) else v
+            for k, v in variables.items()
+        }
+        size = len(output) + sum(sizeof(v) for v in variables.values())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Result(output, list(chart_paths), variables, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        self.current_bytes -= self._entries.pop(key).size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+execution_cache = ExecutionCache(EXECUTION_CACHE_MAX_BYTES)
@@ -0,0 +1,34 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.config import AUTH_EXECUTOR_WORKERS, DATA_EXECUTOR_WORKERS, SANDBOX_WORKERS
+
+# Blocking pandas I/O and SQLite lookups made by async endpoints
+data_executor = ThreadPoolExecutor(max_workers=DATA_EXECUTOR_WORKERS, thread_name_prefix="data")
+
+# Threads waiting on generated code. With the sandbox enabled each one waits on
+# a worker process; without it, complete_python_task redirects the
+# process-wide sys.stdout, so jobs must run one at a time.
+code_executor = ThreadPoolExecutor(max_workers=max(1, SANDBOX_WORKERS), thread_name_prefix="code-exec")
+
+# bcrypt hashing for signup/login, kept apart so it cannot starve data work
+auth_executor = ThreadPoolExecutor(max_workers=max(1, AUTH_EXECUTOR_WORKERS), thread_name_prefix="auth")
+
+
+async def run_in(executor, func, *args, **kwargs):
+    """Run a blocking callable on executor without blocking the event loop.
+
+    The call runs in a copy of the caller's context, so request-scoped state
+    (such as the stage timings behind Server-Timing) follows it to the thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executors():
+    data_executor.shutdown(wait=False)
+    code_executor.shutdown(wait=False)
+    auth_executor.shutdown(wait=False)
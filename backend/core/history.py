@@ -0,0 +1,126 @@
+import json
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend.config import HISTORY_RECENT_TURNS, HISTORY_TOKEN_BUDGET, HISTORY_TOOL_SUMMARY_CHARS
+from backend.core.prompts import count_tokens
+
+# Compacted messages remembered across turns, so each turn only compacts
+# and counts what is new
+_CACHE_SIZE = 4096
+
+
+def _replace(message, **fields):
+    # langchain-core messages are pydantic models (v2 or v1 API)
+    if hasattr(message, "model_copy"):
+        return message.model_copy(update=fields)
+    return message.copy(update=fields)
+
+
+def _shorten(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit].rstrip()}\n... [{len(text) - limit} more characters omitted]"
+
+
+def split_turns(messages: list) -> list:
+    """Group messages into turns, each starting at a HumanMessage"""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class HistoryManager:
+    """Keeps the conversation sent to the model under a token budget.
+
+    The last recent_turns turns are sent verbatim. In older turns, tool
+    outputs are cut to a short excerpt and generated code is replaced by its
+    first lines; the tool calls and their ids are kept, so every tool
+    message still answers a call. If that is still over budget, the oldest
+    turns are dropped whole and replaced by a one-line note.
+    """
+
+    def __init__(self, token_budget: int, recent_turns: int, summary_chars: int, model: str = "gpt-4"):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_chars = summary_chars
+        self.model = model
+        self._cache = OrderedDict()  # fingerprint -> (compacted message, tokens)
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, message, compact: bool):
+        tool_calls = getattr(message, "tool_calls", None) or []
+        return (
+            compact,
+            message.type,
+            message.content if isinstance(message.content, str) else json.dumps(message.content, default=str),
+            getattr(message, "tool_call_id", None),
+            json.dumps(tool_calls, sort_keys=True, default=str),
+        )
+
+    def _compact_message(self, message):
+        if isinstance(message, ToolMessage) and isinstance(message.content, str):
+            return _replace(message, content=_shorten(message.content, self.summary_chars))
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tool_calls = []
+            for call in message.tool_calls:
+                args = dict(call.get("args") or {})
+                code = args.get("python_code")
+                if isinstance(code, str):
+                    lines = code.splitlines()
+                    if len(lines) > 5:
+                        args["python_code"] = "\n".join(lines[:5]) + f"\n# ... {len(lines) - 5} more lines omitted"
+                tool_calls.append({**call, "args": args})
+            return _replace(message, tool_calls=tool_calls)
+        return message
+
+    def _entry(self, message, compact: bool):
+        key = self._fingerprint(message, compact)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                return entry
+        compacted = self._compact_message(message) if compact else message
+        tool_calls = getattr(compacted, "tool_calls", None) or []
+        content = compacted.content if isinstance(compacted.content, str) else json.dumps(compacted.content, default=str)
+        tokens = count_tokens(content, self.model)
+        if tool_calls:
+            tokens += count_tokens(json.dumps(tool_calls, default=str), self.model)
+        entry = (compacted, tokens)
+        with self._lock:
+            self._cache[key] = entry
+            while len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return entry
+
+    def compact(self, messages: list) -> list:
+        """Messages to send to the model, within token_budget where possible"""
+        turns = split_turns(list(messages))
+        recent_start = max(len(turns) - self.recent_turns, 0)
+        compacted_turns = []
+        for index, turn in enumerate(turns):
+            entries = [self._entry(m, compact=index < recent_start) for m in turn]
+            compacted_turns.append(([m for m, _ in entries], sum(t for _, t in entries)))
+
+        total = sum(tokens for _, tokens in compacted_turns)
+        dropped = 0
+        # Never drop the recent turns, even if they alone exceed the budget
+        while total > self.token_budget and dropped < recent_start:
+            total -= compacted_turns[dropped][1]
+            dropped += 1
+
+        history = []
+        if dropped:
+            history.append(HumanMessage(content=f"[{dropped} earlier exchanges omitted to save context]"))
+        for turn_messages, _ in compacted_turns[dropped:]:
+            history.extend(turn_messages)
+        return history
+
+
+history_manager = HistoryManager(HISTORY_TOKEN_BUDGET, HISTORY_RECENT_TURNS, HISTORY_TOOL_SUMMARY_CHARS)
@@ -0,0 +1,44 @@
+import os
+from typing import TYPE_CHECKING
+
+import httpx
+
+from backend.config import (
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_TIMEOUT_SECONDS,
+)
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_client = None
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """Return the process-wide AsyncOpenAI client, creating it on first use.
+
+    Every request shares one bounded httpx connection pool, so concurrent
+    chats reuse keep-alive connections instead of opening their own.
+    """
+    global _client
+    if _client is None:
+        # openai takes about a second to import; startup warms this in the background
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=OPENAI_TIMEOUT_SECONDS,
+        )
+        _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    return _client
+
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+from backend.config import LLM_CACHE_MAX_BYTES, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS
+from backend.core.db import ConnectionPool
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?.! ")
+
+
+def make_cache_key(model: str, template_version: str, dataset_hash: str, question: str, extra: str = "") -> str:
+    payload = json.dumps([model, template_version, dataset_hash, normalize_question(question), extra])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed completion cache with a TTL and a total size budget"""
+
+    def __init__(self, path: str, ttl_seconds: int, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pool = ConnectionPool(path, setup=self._create_table)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+        conn.commit()
+
+    def get(self, key: str):
+        """Return the cached completion for key, or None if missing or expired"""
+        now = time.time()
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, kind: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, value, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, value, size, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        expired = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        self.evictions += max(expired, 0)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are back under budget
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._pool.connection() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+os.makedirs(os.path.dirname(LLM_CACHE_PATH) or ".", exist_ok=True)
+llm_cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES)
@@ -0,0 +1,88 @@
+import gzip
+import logging
+import os
+import threading
+import uuid
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip variants are written
+    brotli = None
+
+from backend.core.executors import data_executor
+
+logger = logging.getLogger(__name__)
+
+# Content-Encoding -> file suffix, in order of preference
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Smaller files are not worth a compressed copy
+MIN_COMPRESS_BYTES = 1024
+
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def available_encodings() -> list:
+    return [encoding for encoding in VARIANT_SUFFIXES if encoding != "br" or brotli is not None]
+
+
+def variant_path(path: str, encoding: str) -> str:
+    return path + VARIANT_SUFFIXES[encoding]
+
+
+def base_name(filename: str) -> str:
+    """File name without a precompressed-variant suffix"""
+    for suffix in VARIANT_SUFFIXES.values():
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(path: str):
+    """Write .br/.gz copies of path next to it, skipping ones that exist"""
+    missing = [e for e in available_encodings() if not os.path.exists(variant_path(path, e))]
+    if not missing:
+        return
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    if len(data) < MIN_COMPRESS_BYTES:
+        return
+    for encoding in missing:
+        target = variant_path(path, encoding)
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_compress(data, encoding))
+        os.replace(tmp_path, target)
+
+
+def _precompress_job(path: str):
+    try:
+        precompress(path)
+    except Exception as e:
+        logger.info(f"Could not precompress {path}: {e}")
+    finally:
+        with _scheduled_lock:
+            _scheduled.discard(path)
+
+
+def schedule_precompress(path: str):
+    """Precompress path on the data executor unless a job for it is pending"""
+    with _scheduled_lock:
+        if path in _scheduled:
+            return
+        _scheduled.add(path)
+    try:
+        data_executor.submit(_precompress_job, path)
+    except RuntimeError:  # Executor shut down
+        with _scheduled_lock:
+            _scheduled.discard(path)
@@ -0,0 +1,220 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend.core.db import connection
+
+TOP_K = 5
+HISTOGRAM_BINS = 10
+SAMPLE_ROWS = 5
+# Values kept per column for the histogram reservoir and the distinct sketch
+RESERVOIR_SIZE = 10000
+SKETCH_SIZE = 1024
+# Candidate values tracked per column for top-k before trimming
+TOP_K_CANDIDATES = 1000
+
+
+class _ColumnState:
+    def __init__(self):
+        self.dtype = None
+        self.count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.sketch = np.empty(0, dtype=np.uint64)
+        self.top = {}
+        self.reservoir = np.empty(0, dtype=np.float64)
+        self.numeric_seen = 0
+
+
+class DatasetProfiler:
+    """Builds a per-column profile incrementally from DataFrame chunks"""
+
+    def __init__(self, seed: int = 0):
+        self.columns = {}
+        self.row_count = 0
+        self.sample = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk: pd.DataFrame):
+        if self.sample is None:
+            head = chunk.head(SAMPLE_ROWS)
+            self.sample = head.astype(object).where(head.notna(), None).to_dict(orient="records")
+        self.row_count += len(chunk)
+        for col in chunk.columns:
+            state = self.columns.setdefault(col, _ColumnState())
+            self._update_column(state, chunk[col])
+
+    def _update_column(self, state: _ColumnState, series: pd.Series):
+        dtype = str(series.dtype)
+        if state.dtype is None:
+            state.dtype = dtype
+        elif state.dtype != dtype:
+            state.dtype = "object"
+
+        state.count += len(series)
+        values = series.dropna()
+        state.null_count += len(series) - len(values)
+        if values.empty:
+            return
+
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            self._update_range(state, values.min(), values.max())
+            self._update_reservoir(state, values.to_numpy(dtype=np.float64))
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            self._update_range(state, values.min(), values.max())
+
+        # K-minimum-values sketch for the distinct count
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        merged = np.union1d(state.sketch, np.unique(hashes)[:SKETCH_SIZE])
+        state.sketch = merged[:SKETCH_SIZE]
+
+        for value, count in values.value_counts().head(TOP_K_CANDIDATES).items():
+            state.top[value] = state.top.get(value, 0) + int(count)
+        if len(state.top) > TOP_K_CANDIDATES:
+            kept = sorted(state.top.items(), key=lambda item: item[1], reverse=True)[:TOP_K_CANDIDATES]
+            state.top = dict(kept)
+
+    def _update_range(self, state: _ColumnState, low, high):
+        state.min = low if state.min is None or low < state.min else state.min
+        state.max = high if state.max is None or high > state.max else state.max
+
+    def _update_reservoir(self, state: _ColumnState, values: np.ndarray):
+        values = values[np.isfinite(values)]
+        seen_before = state.numeric_seen
+        state.numeric_seen += len(values)
+        room = RESERVOIR_SIZE - len(state.reservoir)
+        if room > 0:
+            state.reservoir = np.concatenate([state.reservoir, values[:room]])
+            values = values[room:]
+            seen_before += room
+        if len(values) == 0:
+            return
+        # Reservoir sampling: item i replaces a slot with probability k / i
+        positions = seen_before + np.arange(1, len(values) + 1)
+        slots = (self._rng.random(len(values)) * positions).astype(np.int64)
+        keep = slots < RESERVOIR_SIZE
+        state.reservoir[slots[keep]] = values[keep]
+
+    def finalize(self) -> dict:
+        columns = {}
+        for col, state in self.columns.items():
+            columns[str(col)] = {
+                "dtype": state.dtype,
+                "null_count": state.null_count,
+                "min": _to_json_value(state.min),
+                "max": _to_json_value(state.max),
+                "distinct_estimate": _estimate_distinct(state.sketch),
+                "top_values": [
+                    {"value": _to_json_value(value), "count": count}
+                    for value, count in sorted(state.top.items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+                ],
+                "histogram": _histogram(state),
+            }
+        return {
+            "row_count": self.row_count,
+            "columns": columns,
+            "sample": [
+                {str(k): _to_json_value(v) for k, v in row.items()} for row in (self.sample or [])
+            ],
+        }
+
+
+def _estimate_distinct(sketch: np.ndarray) -> int:
+    if len(sketch) < SKETCH_SIZE:
+        return int(len(sketch))
+    kth = float(sketch[-1]) / float(np.iinfo(np.uint64).max)
+    return int((SKETCH_SIZE - 1) / kth) if kth > 0 else int(len(sketch))
+
+
+def _histogram(state: _ColumnState):
+    if len(state.reservoir) == 0:
+        return None
+    counts, edges = np.histogram(state.reservoir, bins=HISTOGRAM_BINS)
+    scale = state.numeric_seen / len(state.reservoir)
+    return {
+        "edges": [float(edge) for edge in edges],
+        "counts": [int(round(count * scale)) for count in counts],
+    }
+
+
+def _to_json_value(value):
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def profile_dataframe(df: pd.DataFrame) -> dict:
+    """Profile an already loaded DataFrame in one pass"""
+    profiler = DatasetProfiler()
+    profiler.update(df)
+    return profiler.finalize()
+
+
+def render_profile(profile: dict, max_columns: int = None) -> str:
+    """Render a stored profile as compact text for LLM prompts"""
+    lines = [f"Rows: {profile.get('row_count', 0)}", "Columns:"]
+    items = list(profile.get("columns", {}).items())
+    for name, col in items[:max_columns]:
+        parts = [col.get("dtype") or "unknown", f"nulls={col.get('null_count', 0)}"]
+        if col.get("min") is not None:
+            parts.append(f"min={col['min']}")
+            parts.append(f"max={col['max']}")
+        parts.append(f"~distinct={col.get('distinct_estimate', 0)}")
+        top = col.get("top_values") or []
+        if top:
+            parts.append("top=" + ", ".join(f"{t['value']!r} ({t['count']})" for t in top))
+        lines.append(f"- {name} ({'; '.join(parts)})")
+    if max_columns is not None and len(items) > max_columns:
+        lines.append(f"- ... {len(items) - max_columns} more columns")
+    sample = profile.get("sample") or []
+    if sample:
+        lines.append(f"Sample rows: {sample}")
+    return "\n".join(lines)
+
+
+def profile_columns(profile: dict) -> list:
+    return list(profile.get("columns", {}).keys())
+
+
+# --- Persistence next to the `files` table in users.db (see backend/core/db.py) ---
+
+def save_profile(file_id: int, profile: dict):
+    with connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO file_profiles (file_id, profile) VALUES (?, ?)",
+            (file_id, json.dumps(profile, default=str))
+        )
+
+
+def load_profile(file_id: int):
+    with connection() as conn:
+        row = conn.execute("SELECT profile FROM file_profiles WHERE file_id = ?", (file_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def load_profile_for_path(path: str):
+    """Return the profile of the most recent upload stored at path, if any"""
+    candidates = {str(path)}
+    try:
+        candidates.add(os.path.relpath(path))
+    except ValueError:
+        pass
+    placeholders = ",".join("?" for _ in candidates)
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT p.profile FROM file_profiles p JOIN files f ON f.id = p.file_id "
+            f"WHERE f.filepath IN ({placeholders}) ORDER BY f.uploaded_at DESC, f.id DESC LIMIT 1",
+            tuple(candidates)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # Optional; token counts fall back to an estimate
+    tiktoken = None
+
+from backend.core.profiling import render_profile
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "../prompts")
+# Rough characters per token for English/code when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+
+class PromptTemplates:
+    """Prompt files read once and kept in memory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._templates = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """Read every template in the directory (idempotent; called at startup)"""
+        with self._lock:
+            if self._templates is None:
+                templates = {}
+                for name in sorted(os.listdir(self.directory)):
+                    path = os.path.join(self.directory, name)
+                    if os.path.isfile(path):
+                        with open(path, encoding="utf-8") as f:
+                            templates[name] = f.read()
+                self._templates = templates
+            return self._templates
+
+    def get(self, name: str) -> str:
+        """Template text; raises FileNotFoundError for unknown names"""
+        try:
+            return self.load()[name]
+        except KeyError:
+            raise FileNotFoundError(os.path.join(self.directory, name))
+
+
+prompt_templates = PromptTemplates(PROMPTS_DIR)
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """tiktoken encoding for model, or None to estimate token counts instead"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encodings are downloaded on first use, which fails without network access
+        logger.warning(f"No tiktoken encoding for {model}; estimating token counts: {e}")
+        return None
+
+
+def load_encoding(model: str):
+    """Load (downloading if needed) the encoding up front instead of on the first request"""
+    _encoding(model)
+
+
+def count_tokens(text: str, model: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Cut text to about max_tokens, marking the cut"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    marker = "\n... [truncated]"
+    keep = max(max_tokens - count_tokens(marker, model), 0)
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:keep * CHARS_PER_TOKEN] + marker
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + marker
+
+
+def schema_variants(profile: dict, include_sample: bool = True) -> list:
+    """Renderings of a dataset profile, from most to least detailed"""
+    columns = len(profile.get("columns", {}))
+    variants = []
+    if include_sample:
+        variants.append(render_profile(profile))
+    variants.append(render_profile({**profile, "sample": []}))
+    variants.append(render_profile({**profile, "sample": [], "columns": {
+        name: {**col, "top_values": (col.get("top_values") or [])[:2]}
+        for name, col in profile.get("columns", {}).items()
+    }}))
+    # Wide tables: describe fewer columns in detail, then just name them
+    for limit in (32, 16, 8):
+        if limit < columns:
+            variants.append(render_profile({**profile, "sample": []}, max_columns=limit))
+    variants.append(f"Rows: {profile.get('row_count', 0)}\nColumns: {', '.join(map(str, profile.get('columns', {})))}")
+    return variants
+
+
+class PromptSection:
+    """One part of a prompt, with fallbacks to use when over budget.
+
+    variants run from preferred to most compact. Sections listed earlier in
+    a prompt are more important and are shrunk last.
+    """
+
+    def __init__(self, name: str, variants: list, truncatable: bool = False):
+        self.name = name
+        self.variants = [v for v in variants if v is not None]
+        self.truncatable = truncatable
+        self.level = 0
+
+    @property
+    def text(self) -> str:
+        return self.variants[self.level]
+
+
+class PromptStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self.over_budget = 0
+
+    def record(self, report: dict):
+        with self._lock:
+            self.calls += 1
+            self.tokens_sent += report["tokens"]
+            self.tokens_saved += report["saved_tokens"]
+            self.over_budget += report["tokens"] > report["budget"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved,
+                "over_budget": self.over_budget,
+            }
+
+
+prompt_stats = PromptStats()
+
+
+def fit_sections(sections: list, budget: int, model: str, baseline_tokens: int = None):
+    """Shrink sections until their total fits budget tokens.
+
+    Least important sections step down to more compact variants first;
+    truncatable sections are cut as a last resort. Returns the chosen texts
+    by name and a report with the tokens used and saved against
+    baseline_tokens (the unbudgeted prompt; defaults to every section's
+    first variant).
+    """
+    counts = {}
+
+    def tokens(section):
+        key = (section.name, section.level)
+        if key not in counts:
+            counts[key] = count_tokens(section.text, model)
+        return counts[key]
+
+    full = sum(tokens(s) for s in sections)
+    total = full
+    for section in reversed(sections):
+        while total > budget and section.level < len(section.variants) - 1:
+            total -= tokens(section)
+            section.level += 1
+            total += tokens(section)
+    for section in reversed(sections):
+        if total <= budget:
+            break
+        if section.truncatable:
+            allowed = max(tokens(section) - (total - budget), 0)
+            section.variants.append(truncate_to_tokens(section.text, allowed, model))
+            total -= tokens(section)
+            section.level = len(section.variants) - 1
+            total += tokens(section)
+
+    baseline = full if baseline_tokens is None else baseline_tokens
+    report = {
+        "tokens": total,
+        "budget": budget,
+        "baseline_tokens": baseline,
+        "saved_tokens": max(baseline - total, 0),
+        "compacted": [s.name for s in sections if s.level > 0],
+    }
+    prompt_stats.record(report)
+    if total > budget:
+        logger.info(f"Prompt is over budget ({total} > {budget} tokens) after compaction")
+    return {s.name: s.text for s in sections}, report
@@ -0,0 +1,249 @@
+import logging
+import multiprocessing
+import os
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process limits
+    resource = None
+
+from backend.config import (
+    SANDBOX_JOB_TIMEOUT_SECONDS,
+    SANDBOX_MAX_JOBS_PER_WORKER,
+    SANDBOX_MEMORY_LIMIT_MB,
+    SANDBOX_WORKERS,
+)
+from backend.core.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Imported once in the fork server so every worker starts warm
+PRELOAD_MODULES = [
+    "pandas",
+    "numpy",
+    "plotly.express",
+    "plotly.graph_objects",
+    "sklearn",
+    "backend.graph.tools",
+]
+
+
+class SandboxError(RuntimeError):
+    pass
+
+
+def _worker_main(conn, memory_limit_bytes):
+    """Entry point of a sandbox worker: run jobs from conn until told to stop"""
+    if resource is not None and memory_limit_bytes:
+        # RLIMIT_DATA covers heap allocations but not file-backed mmaps, so
+        # memory-mapped datasets do not count against the limit
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_limit_bytes, memory_limit_bytes))
+
+    from backend.core.dataframe_cache import enable_copy_on_write
+    from backend.core.metrics import collect_timings
+    from backend.graph.tools import describe_variables, execute_python
+
+    enable_copy_on_write()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            with collect_timings() as timings:
+                output, updated_state = execute_python(**job)
+            # Variables stay in the worker; the API process only needs their names
+            if "current_variables" in updated_state:
+                updated_state["current_variables"] = describe_variables(updated_state["current_variables"])
+            # Stage timings are recorded again by the API process, which serves /metrics
+            conn.send(("ok", ((output, updated_state), timings)))
+        except MemoryError:
+            conn.send(("fatal", "Execution exceeded the sandbox memory limit"))
+            break
+        except BaseException as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+        self.busy = False
+        self.sessions = set()
+
+
+class SandboxPool:
+    """Pool of pre-warmed worker processes that execute generated code.
+
+    Each session is pinned to one worker so its variables persist between
+    runs. Jobs get a wall-clock timeout and a memory limit; workers that time
+    out, crash or reach max_jobs are replaced, and the sessions pinned to them
+    start over on a fresh worker.
+    """
+
+    def __init__(self, size: int, timeout: float, memory_limit_mb: int, max_jobs: int):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024 if memory_limit_mb else 0
+        self.max_jobs = max_jobs
+        self._workers = []
+        self._session_workers = {}
+        self._cond = threading.Condition()
+        self._context = None
+        self.recycled = 0
+        self.timeouts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self):
+        """Start the fork server and all workers (idempotent)"""
+        with self._cond:
+            if self._workers or not self.enabled:
+                return
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._context = multiprocessing.get_context("forkserver")
+                self._context.set_forkserver_preload(PRELOAD_MODULES)
+            else:
+                self._context = multiprocessing.get_context("spawn")
+            self._workers = [self._spawn() for _ in range(self.size)]
+        logger.info(f"Sandbox pool started with {self.size} workers")
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.memory_limit_bytes),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(self.timeout) or parent_conn.recv()[0] != "ready":
+            process.kill()
+            raise SandboxError("Sandbox worker failed to start")
+        return _Worker(process, parent_conn)
+
+    def _acquire(self, session_id: str) -> _Worker:
+        with self._cond:
+            while True:
+                if not self._workers:
+                    raise SandboxError("No sandbox workers available")
+                worker = self._session_workers.get(session_id)
+                if worker is None:
+                    free = [w for w in self._workers if not w.busy]
+                    if free:
+                        worker = min(free, key=lambda w: len(w.sessions))
+                        worker.sessions.add(session_id)
+                        self._session_workers[session_id] = worker
+                if worker is not None and not worker.busy:
+                    worker.busy = True
+                    return worker
+                self._cond.wait()
+
+    def _release(self, worker: _Worker, replace: bool):
+        with self._cond:
+            retire = replace and worker in self._workers
+            if retire:
+                # Stays busy, so no job reaches it while it is replaced
+                for session_id in worker.sessions:
+                    self._session_workers.pop(session_id, None)
+                worker.sessions.clear()
+            else:
+                worker.busy = False
+            self._cond.notify_all()
+        if retire:
+            self._retire(worker)
+
+    def _retire(self, worker: _Worker):
+        """Replace a worker; the slow part (kill, spawn) runs without holding _cond"""
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+        try:
+            replacement = self._spawn()
+        except SandboxError as e:
+            logger.error(f"Could not replace sandbox worker: {e}")
+            replacement = None
+        with self._cond:
+            self.recycled += 1
+            if worker in self._workers:
+                index = self._workers.index(worker)
+                if replacement is None:
+                    self._workers.pop(index)
+                else:
+                    self._workers[index] = replacement
+                    replacement = None
+            self._cond.notify_all()
+        if replacement is not None:
+            # The pool was shut down while the worker was being replaced
+            replacement.process.kill()
+
+    def run(self, session_id: str, job: dict):
+        """Run job (keyword arguments of execute_python) on the session's worker"""
+        self.start()
+        worker = self._acquire(session_id)
+        replace = False
+        try:
+            try:
+                worker.conn.send(job)
+            except (BrokenPipeError, OSError) as e:
+                replace = True
+                raise SandboxError(f"Sandbox worker unavailable: {e}")
+            if not worker.conn.poll(self.timeout):
+                replace = True
+                self.timeouts += 1
+                raise SandboxError(f"Execution timed out after {self.timeout:g} seconds")
+            try:
+                status, payload = worker.conn.recv()
+            except EOFError:
+                replace = True
+                raise SandboxError("Sandbox worker crashed while executing code")
+            worker.jobs += 1
+            if status == "fatal" or worker.jobs >= self.max_jobs or not worker.process.is_alive():
+                replace = True
+            if status != "ok":
+                raise SandboxError(payload)
+            result, timings = payload
+            for stage, seconds in timings:
+                record_stage(stage, seconds)
+            return result
+        finally:
+            self._release(worker, replace)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": len(self._workers),
+                "busy": sum(w.busy for w in self._workers),
+                "sessions": len(self._session_workers),
+                "recycled": self.recycled,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            for worker in self._workers:
+                try:
+                    worker.conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+                worker.process.join(timeout=2)
+                if worker.process.is_alive():
+                    worker.process.kill()
+            self._workers = []
+            self._session_workers = {}
+
+
+sandbox_pool = SandboxPool(
+    size=SANDBOX_WORKERS,
+    timeout=SANDBOX_JOB_TIMEOUT_SECONDS,
+    memory_limit_mb=SANDBOX_MEMORY_LIMIT_MB,
+    max_jobs=SANDBOX_MAX_JOBS_PER_WORKER,
+)
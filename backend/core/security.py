@@ -0,0 +1,107 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from backend.config import AUTH_TOKEN_SECRET, AUTH_TOKEN_TTL_SECONDS, USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+if AUTH_TOKEN_SECRET:
+    _secret = AUTH_TOKEN_SECRET.encode("utf-8")
+else:
+    logger.warning("AUTH_TOKEN_SECRET is not set; session tokens are only valid in this process")
+    _secret = secrets.token_bytes(32)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, username: str, ttl_seconds: int = AUTH_TOKEN_TTL_SECONDS) -> str:
+    """HMAC-signed, expiring session token: <base64 claims>.<base64 signature>"""
+    claims = {"uid": user_id, "sub": username, "exp": int(time.time()) + ttl_seconds}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token: str):
+    """Return the token's claims, or None if it is malformed, forged or expired"""
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError, UnicodeError):  # TypeError: non-ASCII signature
+        return None
+    if not isinstance(claims, dict) or not {"uid", "sub", "exp"} <= claims.keys():
+        return None
+    if claims["exp"] < time.time():
+        return None
+    return claims
+
+
+class UserCache:
+    """Small LRU of user records by id, so authenticated requests skip the DB"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # user id -> (user, loaded_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, user_id: int):
+        """Return the cached user, or None without loading it"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            return None
+
+    def get(self, user_id: int, loader):
+        """Return the cached user, calling loader(user_id) on a miss"""
+        user = self.cached(user_id)
+        if user is not None:
+            return user
+        with self._lock:
+            self.misses += 1
+        user = loader(user_id)
+        if user is not None:
+            self.put(user)
+        return user
+
+    def put(self, user):
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic())
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
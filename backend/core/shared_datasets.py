@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from backend.config import SHARED_DATASET_DIR, VARIABLE_SESSION_TTL_SECONDS
+from backend.core.columnar import columnar_path, has_columnar_copy
+from backend.core.dataframe_cache import file_identity, get_dataframe
+
+logger = logging.getLogger(__name__)
+
+# Datasets a sandbox worker keeps attached; attached frames are memory-mapped
+# views, so this bounds open mappings rather than private memory
+MAX_ATTACHED = 8
+
+
+def _segment_dir() -> str:
+    if SHARED_DATASET_DIR:
+        return SHARED_DATASET_DIR
+    # tmpfs keeps segments in shared memory where available
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+class _Segment:
+    def __init__(self, path: str, owned: bool):
+        self.path = path
+        self.owned = owned
+        self.sessions = set()
+
+
+class SharedDatasetRegistry:
+    """Publishes datasets as memory-mapped Arrow IPC files for sandbox workers.
+
+    Uploads that already have an Arrow copy are shared as-is. Anything else is
+    written once into a segment under /dev/shm. Each session holds a reference
+    to the datasets it uses; owned segments are unlinked once no session
+    refers to them.
+    """
+
+    def __init__(self, idle_ttl_seconds: int):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._segments = {}  # dataset identity -> _Segment
+        self._session_segments = {}  # session_id -> identity
+        self._last_active = {}
+        self._creating = {}  # identity -> Event set once its segment is written
+        self._lock = threading.Lock()
+
+    def publish(self, data_path: str, session_id: str) -> dict:
+        """Return a handle a worker can attach to, referenced by session_id"""
+        identity = file_identity(data_path)
+        while True:
+            with self._lock:
+                self._expire_idle(session_id)
+                segment = self._segments.get(identity)
+                if segment is not None:
+                    return self._reference(segment, identity, session_id)
+                pending = self._creating.get(identity)
+                if pending is None:
+                    pending = self._creating[identity] = threading.Event()
+                    break
+            # Another session is writing this segment; use it once it is done
+            pending.wait()
+        # Parsing and writing the segment can take seconds, so other datasets
+        # are published meanwhile; only callers of this one wait
+        try:
+            segment = self._create_segment(data_path, identity)
+        except BaseException:
+            with self._lock:
+                self._creating.pop(identity).set()
+            raise
+        with self._lock:
+            self._creating.pop(identity).set()
+            self._segments[identity] = segment
+            return self._reference(segment, identity, session_id)
+
+    def release_session(self, session_id: str):
+        with self._lock:
+            identity = self._session_segments.pop(session_id, None)
+            self._last_active.pop(session_id, None)
+            if identity is not None:
+                self._unref(identity, session_id)
+
+    def release_all(self):
+        with self._lock:
+            for identity in list(self._segments):
+                segment = self._segments.pop(identity)
+                self._unlink(segment)
+            self._session_segments.clear()
+            self._last_active.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "owned_segments": sum(s.owned for s in self._segments.values()),
+                "sessions": len(self._session_segments),
+            }
+
+    def _create_segment(self, data_path: str, identity: tuple) -> _Segment:
+        if has_columnar_copy(data_path):
+            return _Segment(str(columnar_path(data_path)), owned=False)
+        # No typed copy (e.g. it could not be converted); publish the parsed frame once
+        df = get_dataframe(data_path)
+        name = hashlib.sha1(repr(identity).encode()).hexdigest()
+        path = os.path.join(_segment_dir(), f"insights-{name}.arrow")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return _Segment(path, owned=True)
+
+    def _reference(self, segment: _Segment, identity: tuple, session_id: str) -> dict:
+        previous = self._session_segments.get(session_id)
+        if previous is not None and previous != identity:
+            self._unref(previous, session_id)
+        segment.sessions.add(session_id)
+        self._session_segments[session_id] = identity
+        return {"path": segment.path, "identity": identity}
+
+    def _unref(self, identity: tuple, session_id: str):
+        segment = self._segments.get(identity)
+        if segment is None:
+            return
+        segment.sessions.discard(session_id)
+        if not segment.sessions:
+            del self._segments[identity]
+            self._unlink(segment)
+
+    def _unlink(self, segment: _Segment):
+        if segment.owned:
+            try:
+                os.remove(segment.path)
+            except FileNotFoundError:
+                pass
+
+    def _expire_idle(self, active_session: str):
+        now = time.monotonic()
+        for session_id, last in list(self._last_active.items()):
+            if session_id != active_session and now - last > self.idle_ttl_seconds:
+                identity = self._session_segments.pop(session_id, None)
+                self._last_active.pop(session_id, None)
+                if identity is not None:
+                    self._unref(identity, session_id)
+        self._last_active[active_session] = now
+
+
+shared_datasets = SharedDatasetRegistry(VARIABLE_SESSION_TTL_SECONDS)
+
+
+# --- Worker side ---
+
+_attached = OrderedDict()
+_attached_lock = threading.Lock()
+
+
+def attach(handle: dict) -> pd.DataFrame:
+    """Map a published dataset read-only into this process without copying it.
+
+    Fixed-width columns without nulls become views over the mapping; pandas
+    copy-on-write copies them only if the code modifies them.
+    """
+    key = tuple(handle["identity"])
+    with _attached_lock:
+        df = _attached.get(key)
+        if df is not None:
+            _attached.move_to_end(key)
+            return df
+    source = pa.memory_map(handle["path"], "r")
+    table = pa.ipc.open_file(source).read_all()
+    df = table.to_pandas(split_blocks=True)
+    with _attached_lock:
+        _attached[key] = df
+        while len(_attached) > MAX_ATTACHED:
+            _attached.popitem(last=False)
+    return df
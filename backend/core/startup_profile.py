@@ -0,0 +1,102 @@
+"""Startup timing: phase marks for the running app and per-module import times.
+
+Run `python -m backend.core.startup_profile [--output report.json]` to import
+backend.main in a fresh interpreter under `-X importtime` and report the
+slowest modules, so cold-start cost can be compared across releases.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+_started = time.perf_counter()
+
+
+class StartupTimer:
+    """Seconds from process start (first import of this module) to each named phase"""
+
+    def __init__(self, started: float):
+        self.started = started
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str) -> float:
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            self._phases.setdefault(phase, elapsed)
+        return elapsed
+
+    def phases(self) -> dict:
+        with self._lock:
+            return {name: round(seconds, 4) for name, seconds in self._phases.items()}
+
+
+startup_timer = StartupTimer(_started)
+
+
+def parse_importtime(stderr: str) -> list:
+    """Rows of `-X importtime` output as dicts, in import order"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header row
+        # Names are indented two spaces per level of nesting, after one separator space
+        name = fields[2].rstrip()
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1]),
+        })
+    return modules
+
+
+def profile_imports(target: str = "backend.main", top: int = 25) -> dict:
+    """Import target in a fresh interpreter and report where the time went"""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    wall_seconds = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{proc.stderr[-2000:]}")
+    modules = parse_importtime(proc.stderr)
+    top_level = [m for m in modules if m["depth"] == 0]
+    return {
+        "target": target,
+        "python": sys.version.split()[0],
+        "wall_seconds": round(wall_seconds, 4),
+        "import_seconds": round(sum(m["cumulative_us"] for m in top_level) / 1e6, 4),
+        "module_count": len(modules),
+        "slowest_cumulative": sorted(modules, key=lambda m: -m["cumulative_us"])[:top],
+        "slowest_self": sorted(modules, key=lambda m: -m["self_us"])[:top],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="backend.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.target, args.top)
+    print(f"import {report['target']}: {report['import_seconds']:.3f}s in imports, "
+          f"{report['wall_seconds']:.3f}s wall, {report['module_count']} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for m in report["slowest_cumulative"]:
+        print(f"{m['cumulative_us'] / 1000:>14.1f} {m['self_us'] / 1000:>9.1f}  {m['module']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import ast
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from backend.config import VARIABLE_SESSION_TTL_SECONDS, VARIABLE_SPILL_DIR, VARIABLE_STORE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def sizeof(value) -> int:
+    """Approximate in-memory size of a variable in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+def value_fingerprint(value) -> str:
+    """Content hash of a variable, used to key cached execution results"""
+    digest = hashlib.sha256(type(value).__name__.encode())
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"{value.dtype}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        try:
+            digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+def referenced_names(python_code: str) -> set:
+    """Every identifier the code reads, used to load only the variables it needs"""
+    try:
+        tree = ast.parse(python_code)
+    except SyntaxError:
+        return set()
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+class _Entry:
+    def __init__(self, value, size):
+        self.value = value
+        self.size = size
+        self.spill_path = None
+        self.fingerprint = None
+
+
+class SessionVariableStore:
+    """Variables created by generated code, kept per session.
+
+    Sizes are tracked for every value. Sessions idle for longer than the TTL
+    are dropped, and when the total exceeds max_bytes the least recently used
+    variables are evicted. Evicted DataFrames are spilled to spill_dir (as
+    Arrow files, or pickles when their column names are not all strings)
+    and reloaded lazily the next time code refers to them.
+    """
+
+    def __init__(self, max_bytes: int, idle_ttl_seconds: int, spill_dir: str = None):
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.spill_dir = spill_dir
+        self._entries = OrderedDict()  # (session_id, name) -> _Entry, LRU first
+        self._last_active = {}
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.evictions = 0
+        self.spills = 0
+        self.reloads = 0
+        self.expired_sessions = 0
+
+    def load(self, session_id: str, names=None) -> dict:
+        """Return the session's variables, limited to names if given"""
+        with self._lock:
+            self._touch(session_id)
+            variables = {}
+            for (sid, name), entry in list(self._entries.items()):
+                if sid != session_id or (names is not None and name not in names):
+                    continue
+                if entry.spill_path is not None:
+                    self._reload(entry)
+                self._entries.move_to_end((sid, name))
+                variables[name] = entry.value
+            self._evict(keep=session_id)
+            return variables
+
+    def update(self, session_id: str, variables: dict):
+        with self._lock:
+            self._touch(session_id)
+            for name, value in variables.items():
+                key = (session_id, name)
+                entry = self._entries.get(key)
+                if entry is not None and entry.value is value:
+                    # The same object may have been changed in place: forget
+                    # its fingerprint and measure it again
+                    size = sizeof(value)
+                    self.current_bytes += size - entry.size
+                    entry.size = size
+                    entry.fingerprint = None
+                    self._entries.move_to_end(key)
+                    continue
+                if entry is not None:
+                    self._drop(key)
+                entry = _Entry(value, sizeof(value))
+                self._entries[key] = entry
+                self.current_bytes += entry.size
+            self._evict(keep=session_id)
+
+    def fingerprints(self, session_id: str, names) -> dict:
+        """Content hashes of the session's variables among names, computed once per value"""
+        with self._lock:
+            fingerprints = {}
+            for name in names:
+                entry = self._entries.get((session_id, name))
+                if entry is None:
+                    continue
+                if entry.fingerprint is None:
+                    if entry.spill_path is not None:
+                        self._reload(entry)
+                    entry.fingerprint = value_fingerprint(entry.value)
+                fingerprints[name] = entry.fingerprint
+            return fingerprints
+
+    def names(self, session_id: str) -> list:
+        with self._lock:
+            return [name for sid, name in self._entries if sid == session_id]
+
+    def clear_session(self, session_id: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session_id]:
+                self._drop(key)
+            self._last_active.pop(session_id, None)
+            if self.spill_dir:
+                shutil.rmtree(self._session_spill_dir(session_id), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._last_active),
+                "variables": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "spills": self.spills,
+                "reloads": self.reloads,
+                "expired_sessions": self.expired_sessions,
+            }
+
+    def _touch(self, session_id: str):
+        now = time.monotonic()
+        for sid, last in list(self._last_active.items()):
+            if sid != session_id and now - last > self.idle_ttl_seconds:
+                self.clear_session(sid)
+                self.expired_sessions += 1
+        self._last_active[session_id] = now
+
+    def _evict(self, keep: str):
+        # Evict other sessions' variables before touching the active one
+        for only_others in (True, False):
+            for key in list(self._entries):
+                if self.current_bytes <= self.max_bytes:
+                    return
+                entry = self._entries[key]
+                if entry.spill_path is not None or (only_others and key[0] == keep):
+                    continue
+                self.evictions += 1
+                if self._spill(key, entry):
+                    continue
+                self._drop(key)
+
+    def _spill(self, key, entry) -> bool:
+        if not self.spill_dir or not isinstance(entry.value, pd.DataFrame):
+            return False
+        # Feather only takes unique string column names; other frames are
+        # pickled so they come back with the same columns
+        columns = entry.value.columns
+        arrow = columns.is_unique and all(isinstance(c, str) for c in columns)
+        name = hashlib.sha1(key[1].encode()).hexdigest()
+        path = os.path.join(self._session_spill_dir(key[0]), f"{name}.arrow" if arrow else f"{name}.pkl")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if arrow:
+                feather.write_feather(entry.value, path, compression="uncompressed")
+            else:
+                with open(path, "wb") as f:
+                    pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.info(f"Could not spill variable {key[1]!r}: {e}")
+            return False
+        self.current_bytes -= entry.size
+        entry.value = None
+        entry.spill_path = path
+        self.spills += 1
+        return True
+
+    def _reload(self, entry: _Entry):
+        if entry.spill_path.endswith(".arrow"):
+            entry.value = feather.read_feather(entry.spill_path)
+        else:
+            with open(entry.spill_path, "rb") as f:
+                entry.value = pickle.load(f)
+        os.remove(entry.spill_path)
+        entry.spill_path = None
+        self.current_bytes += entry.size
+        self.reloads += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        if entry.spill_path is not None:
+            try:
+                os.remove(entry.spill_path)
+            except FileNotFoundError:
+                pass
+        else:
+            self.current_bytes -= entry.size
+
+    def _session_spill_dir(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(session_id.encode()).hexdigest()[:16])
+
+
+variable_store = SessionVariableStore(
+    max_bytes=VARIABLE_STORE_MAX_BYTES,
+    idle_ttl_seconds=VARIABLE_SESSION_TTL_SECONDS,
+    spill_dir=VARIABLE_SPILL_DIR or None,
+)
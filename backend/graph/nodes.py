@@ -1,34 +1,57 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, ToolMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import InjectedToolCallId, tool
+from langgraph.prebuilt import InjectedState
+from langgraph.types import Command
 from backend.graph.state import AgentState, serialize_state
 import json
-from typing import Literal
+from functools import lru_cache
+from typing import Annotated, Literal
 from backend.graph.tools import complete_python_task
+from backend.core.profiling import load_profile_for_path, render_profile
+from backend.core.history import history_manager
+from backend.core.prompts import prompt_templates
 # ToolExecutor and ToolInvocation are no longer needed
 # Remove tool_executor and call_tools
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-llm = ChatOpenAI(
-    model="gpt-4",  # or "gpt-3.5-turbo" if you prefer
-    temperature=0.7,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+@tool("complete_python_task", description=complete_python_task.description)
+def agent_python_task(
+    graph_state: Annotated[dict, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    thought: str,
+    python_code: str
+) -> Command:
+    # The graph state (datasets, session id) is injected by the ToolNode
+    # rather than written by the model
+    output, updated_state = complete_python_task.func(graph_state, thought, python_code)
+    # The model sees the result as before; charts and outputs also go into the
+    # checkpointed state, where PythonChatbot reads each turn's charts from
+    return Command(update={
+        "messages": [ToolMessage(content=str((output, updated_state)), tool_call_id=tool_call_id)],
+        "intermediate_outputs": updated_state.get("intermediate_outputs", []),
+        "output_image_paths": updated_state.get("output_image_paths", []),
+    })
 
-tools = [complete_python_task]
+tools = [agent_python_task]
 
-model = llm.bind_tools(tools)
+@lru_cache(maxsize=1)
+def get_model():
+    """Prompt | tool-bound chat model, built on first use rather than at import"""
+    from langchain_openai import ChatOpenAI
 
-with open(os.path.join(os.path.dirname(__file__), "../prompts/main_prompt.md"), "r") as file:
-    prompt = file.read()
-
-chat_template = ChatPromptTemplate.from_messages([
-    ("system", prompt),
-    ("placeholder", "{messages}"),
-])
-model = chat_template | model
+    llm = ChatOpenAI(
+        model="gpt-4",  # or "gpt-3.5-turbo" if you prefer
+        temperature=0.7,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
+    chat_template = ChatPromptTemplate.from_messages([
+        ("system", prompt_templates.get("main_prompt.md")),
+        ("placeholder", "{messages}"),
+    ])
+    return chat_template | llm.bind_tools(tools)
 
 def create_data_summary(state: AgentState) -> str:
     summary = ""
@@ -39,18 +62,25 @@ def create_data_summary(state: AgentState) -> str:
             # InputData object
             variable_name = d.variable_name
             description = d.data_description
+            data_path = d.data_path
         elif isinstance(d, dict) and 'variable_name' in d:
             # Dictionary from serialized InputData
             variable_name = d['variable_name']
             description = d.get('data_description', '')
+            data_path = d.get('data_path')
         else:
             # Fallback for unexpected types
             variable_name = str(d)
             description = ''
+            data_path = None
         
         variables.append(variable_name)
         summary += f"\n\nVariable: {variable_name}\n"
         summary += f"Description: {description}"
+        # Stored upload-time profile, so the summary never loads the data
+        profile = load_profile_for_path(data_path) if data_path else None
+        if profile:
+            summary += f"\n{render_profile(profile)}"
     
     current_variables = state.get("current_variables") or {}
     remaining_variables = [v for v in current_variables if v not in variables]
@@ -89,9 +119,10 @@ def call_model(state: AgentState):
 
     current_data_template  = """The following data is available:\n{data_summary}"""
     current_data_message = HumanMessage(content=current_data_template.format(data_summary=create_data_summary(state)))
-    state["messages"] = [current_data_message] + state["messages"]
+    # The checkpointed state keeps the whole conversation; the model sees a compacted copy
+    messages = [current_data_message] + history_manager.compact(state["messages"])
 
-    llm_outputs = model.invoke(state)
+    llm_outputs = get_model().invoke({**state, "messages": messages})
     print("llm_outputs: ", llm_outputs)
 
     return {"messages": [llm_outputs], "intermediate_outputs": [current_data_message.content]}
@@ -74,12 +74,22 @@ def serialize_state(state_dict):
         return cleaned_state
 
 
+def merge_dicts(left: dict, right: dict) -> dict:
+    return {**(left or {}), **(right or {})}
+
+
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
-    input_data: Annotated[List[InputData], operator.add]
+    # Replaced on every turn (the datasets currently selected), so a
+    # checkpointed conversation does not accumulate duplicates
+    input_data: List[InputData]
     intermediate_outputs: Annotated[List[dict], operator.add]
     current_variables: dict
     output_image_paths: Annotated[List[str], operator.add]
+    # Charts produced by each turn, keyed by the index of its final message
+    message_image_paths: Annotated[Dict[str, List[str]], merge_dicts]
+    # Scopes the conversation's variables and sandbox worker (the chatbot's thread id)
+    session_id: str
 
 from pydantic import BaseModel
 
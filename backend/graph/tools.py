@@ -1,21 +1,41 @@
 from langchain_core.tools import tool
-from langchain_experimental.utilities import PythonREPL
-from langchain_core.messages import AIMessage
 from typing import Tuple
 import sys
 from io import StringIO
 import os
-import plotly.graph_objects as go
-import plotly.io as pio
-import plotly.express as px
+import threading
 import pandas as pd
-import sklearn
 import json
 from datetime import datetime, date
 import numpy as np
+from backend.core.chart_cleanup import record_chart_creation
+from backend.core.dataframe_cache import get_dataframe
+from backend.core.execution_cache import execution_cache, execution_key
+from backend.core.metrics import timed
+from backend.core.sandbox import SandboxError, sandbox_pool
+from backend.core.shared_datasets import attach, shared_datasets
+from backend.core.variable_store import referenced_names, variable_store
 
-repl = PythonREPL()
-persistent_vars = {}
+# plotly and sklearn take seconds to import; they are loaded on first use
+# (or by warm_up() after startup) instead of when this module is imported
+_analysis_namespace = None
+_analysis_lock = threading.Lock()
+
+def analysis_namespace() -> dict:
+    """Libraries generated code expects to find already imported"""
+    global _analysis_namespace
+    with _analysis_lock:
+        if _analysis_namespace is None:
+            import plotly.express as px
+            import plotly.graph_objects as go
+            import plotly.io as pio
+            import sklearn
+            _analysis_namespace = {"px": px, "go": go, "pio": pio, "sklearn": sklearn}
+        return _analysis_namespace
+
+def warm_up():
+    """Import the analysis libraries ahead of the first request"""
+    analysis_namespace()
 
 # --- Custom JSON Encoder ---
 class CustomJSONEncoder(json.JSONEncoder):
@@ -64,41 +84,16 @@ def clean_persistent_vars(vars_dict):
 
 # --- HTML chart export block ---
 plotly_html_saving_code = """
-import uuid
-import plotly
-import os
-from backend.core.chart_cleanup import record_chart_creation, cleanup_old_charts, cleanup_orphaned_files
-
-os.makedirs("images/plotly_figures/html", exist_ok=True)
+from backend.core.charts import save_figures
 
-# Run cleanup before generating new charts
-cleanup_old_charts()
-cleanup_orphaned_files()
-
-output_image_paths = []
-
-for figure in plotly_figures:
-    html_filename = f"{uuid.uuid4()}.html"
-    filepath = os.path.join("images/plotly_figures/html", html_filename)
-    plotly.offline.plot(figure, filename=filepath, auto_open=False)
-    record_chart_creation(html_filename)
-    output_image_paths.append(html_filename)
+# Old charts are removed by the background collector (backend/core/chart_gc.py)
+output_image_paths = save_figures(plotly_figures)
 """
 
-# --- MAIN TOOL FUNCTION ---
-@tool
-def complete_python_task(
-    graph_state: dict,
-    thought: str,
-    python_code: str
-) -> Tuple[str, dict]:
-    """
-    Executes Python code for data analysis and visualization using pandas, sklearn, and plotly.
-    Returns the standard output and any generated charts.
-    """
-    current_variables = graph_state.get("current_variables") or {}
-
-    for input_dataset in graph_state["input_data"]:
+def _input_datasets(input_data) -> list:
+    """(variable_name, data_path) pairs from InputData objects or their dict form"""
+    datasets = []
+    for input_dataset in input_data or []:
         if hasattr(input_dataset, 'variable_name'):
             variable_name = input_dataset.variable_name
             data_path = input_dataset.data_path
@@ -107,28 +102,87 @@ def complete_python_task(
             data_path = input_dataset['data_path']
         else:
             continue
+        datasets.append((variable_name, data_path))
+    return datasets
 
-        if variable_name not in current_variables:
-            print(f"Loading data from path: {data_path}")
-            current_variables[variable_name] = pd.read_csv(data_path)
+def describe_variables(variables: dict) -> dict:
+    """Short type/shape descriptions, cheap to send across processes"""
+    described = {}
+    for name, value in variables.items():
+        shape = getattr(value, 'shape', None)
+        described[name] = f"{type(value).__name__} {shape}" if shape is not None else type(value).__name__
+    return described
+
+def execute_python(python_code: str, thought: str, inputs: list, variables: dict = None, session_id: str = "default") -> Tuple[str, dict]:
+    """
+    Runs generated code with the input datasets loaded. Used directly when the
+    sandbox is disabled and inside sandbox workers otherwise.
+    """
+    current_variables = dict(variables or {})
+
+    # The same code on unchanged data and variables is not run again
+    cache_key = None
+    if execution_cache.enabled:
+        cache_key = execution_key(python_code, inputs, current_variables, session_id)
+        cached = execution_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            print("Execution cache hit; skipping execution")
+            variable_store.update(session_id, {
+                k: v.copy(deep=False) if isinstance(v, pd.DataFrame) else v
+                for k, v in cached.variables.items()
+            })
+            updated_state = {
+                "intermediate_outputs": [{"thought": thought, "code": python_code, "output": cached.output}],
+                "current_variables": {**clean_persistent_vars(current_variables), **cached.variables}
+            }
+            if cached.chart_paths:
+                # Reused charts are in use again; keep the collector from expiring them
+                for html_filename in cached.chart_paths:
+                    record_chart_creation(html_filename)
+                updated_state["output_image_paths"] = list(cached.chart_paths)
+            return cached.output, updated_state
+
+    with timed("load_inputs"):
+        for variable_name, source in inputs:
+            if variable_name not in current_variables:
+                # Sandbox jobs carry a shared-dataset handle, in-process runs a path
+                if isinstance(source, dict):
+                    current_variables[variable_name] = attach(source)
+                else:
+                    print(f"Loading data from path: {source}")
+                    current_variables[variable_name] = get_dataframe(source)
+
+    # Cached frames are shared between requests, so hand the code its own
+    # (copy-on-write) view instead of the cached object itself
+    current_variables = {
+        k: v.copy(deep=False) if isinstance(v, pd.DataFrame) else v
+        for k, v in current_variables.items()
+    }
 
     os.makedirs("images/plotly_figures/html", exist_ok=True)
-    current_files = set(os.listdir("images/plotly_figures/html"))
 
+    old_stdout = sys.stdout
     try:
-        old_stdout = sys.stdout
         sys.stdout = StringIO()
 
-        exec_globals = globals().copy()
-        exec_globals.update(persistent_vars)
+        base_globals = {**globals(), **analysis_namespace()}
+        exec_globals = base_globals.copy()
+        # Only the session variables this code refers to are (re)loaded
+        exec_globals.update(variable_store.load(session_id, referenced_names(python_code)))
         exec_globals.update(current_variables)
         exec_globals["plotly_figures"] = []
 
-        exec(python_code, exec_globals)
+        with timed("exec"):
+            exec(python_code, exec_globals)
 
-        new_persistent_vars = {k: v for k, v in exec_globals.items() if k not in globals()}
+        new_persistent_vars = {k: v for k, v in exec_globals.items() if k not in base_globals}
         cleaned_vars = clean_persistent_vars(new_persistent_vars)
-        persistent_vars.update(cleaned_vars)
+        # Input datasets are reloaded on every run; figures are saved below
+        session_vars = {
+            k: v for k, v in cleaned_vars.items()
+            if k not in current_variables and k != "plotly_figures"
+        }
+        variable_store.update(session_id, session_vars)
 
         output = sys.stdout.getvalue()
         sys.stdout = old_stdout
@@ -141,15 +195,17 @@ def complete_python_task(
         # Save charts to HTML
         if exec_globals.get("plotly_figures"):
             print(f"Found {len(exec_globals['plotly_figures'])} charts to save")
-            exec(plotly_html_saving_code, exec_globals)
+            with timed("chart_save"):
+                exec(plotly_html_saving_code, exec_globals)
             html_paths = exec_globals.get("output_image_paths", [])
             print(f"Saved {len(html_paths)} HTML files: {html_paths}")
             if html_paths:
                 updated_state["output_image_paths"] = html_paths
-            persistent_vars["plotly_figures"] = []
         else:
             print("No plotly_figures found in exec_globals")
 
+        if cache_key:
+            execution_cache.put(cache_key, output, updated_state.get("output_image_paths", []), session_vars)
         return output, updated_state
 
     except Exception as e:
@@ -160,3 +216,47 @@ def complete_python_task(
                 "output": str(e)
             }]
         }
+    finally:
+        sys.stdout = old_stdout
+
+# --- MAIN TOOL FUNCTION ---
+@tool
+def complete_python_task(
+    graph_state: dict,
+    thought: str,
+    python_code: str
+) -> Tuple[str, dict]:
+    """
+    Executes Python code for data analysis and visualization using pandas, sklearn, and plotly.
+    Returns the standard output and any generated charts.
+    """
+    inputs = _input_datasets(graph_state.get("input_data"))
+    current_variables = graph_state.get("current_variables") or {}
+
+    session_id = graph_state.get("session_id") or "default"
+
+    if not sandbox_pool.enabled:
+        return execute_python(python_code, thought, inputs, current_variables, session_id)
+
+    # Workers attach input datasets as shared, memory-mapped Arrow files
+    # instead of receiving pickled frames
+    input_names = {name for name, _ in inputs}
+    job = {
+        "python_code": python_code,
+        "thought": thought,
+        "inputs": [(name, shared_datasets.publish(path, session_id)) for name, path in inputs],
+        "variables": {k: v for k, v in current_variables.items() if k not in input_names},
+        "session_id": session_id,
+    }
+    try:
+        with timed("sandbox"):
+            output, updated_state = sandbox_pool.run(session_id, job)
+        return output, updated_state
+    except SandboxError as e:
+        return str(e), {
+            "intermediate_outputs": [{
+                "thought": thought,
+                "code": python_code,
+                "output": str(e)
+            }]
+        }
@@ -0,0 +1,83 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import StateGraph
+from langgraph.prebuilt import ToolNode
+
+from backend.config import AGENT_CHECKPOINT_PATH, DB_BUSY_TIMEOUT_MS
+from backend.graph.nodes import call_model, route_to_tools, tools
+from backend.graph.state import AgentState
+
+logger = logging.getLogger(__name__)
+
+
+def build_graph(checkpointer=None):
+    """The agent/tools loop, compiled with the given checkpointer"""
+    workflow = StateGraph(AgentState)
+    workflow.add_node('agent', call_model)
+    workflow.add_node('tools', ToolNode(tools))
+
+    workflow.add_conditional_edges('agent', route_to_tools)
+
+    workflow.add_edge('tools', 'agent')
+    workflow.set_entry_point('agent')
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def _serializer() -> JsonPlusSerializer:
+    # input_data holds InputData dataclasses; allow them to be read back
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=[("backend.core.data_models", "InputData")])
+    except TypeError:  # langgraph-checkpoint without an allow-list
+        return JsonPlusSerializer()
+
+
+def open_checkpointer(path: str) -> SqliteSaver:
+    """SQLite checkpointer shared by every worker process on this node"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return SqliteSaver(conn, serde=_serializer())
+
+
+class AgentGraph:
+    """The compiled agent graph, built once per process.
+
+    Conversation state lives in the checkpointer keyed by thread id, not in
+    the graph, so one compiled graph serves every session and any worker
+    process can resume any conversation. A forked child builds its own copy
+    rather than share the parent's SQLite connection.
+    """
+
+    def __init__(self, checkpoint_path: str):
+        self.checkpoint_path = checkpoint_path
+        self._graph = None
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._graph is None or self._pid != os.getpid():
+                checkpointer = open_checkpointer(self.checkpoint_path)
+                self._conn = checkpointer.conn
+                self._graph = build_graph(checkpointer)
+                self._pid = os.getpid()
+                logger.info(f"Compiled agent graph with checkpoints in {self.checkpoint_path}")
+            return self._graph
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._graph = None
+            self._conn = None
+
+
+agent_graph = AgentGraph(AGENT_CHECKPOINT_PATH)
@@ -1,9 +1,13 @@
-from fastapi import FastAPI
+# Imported first so startup phases are timed from process start
+from backend.core.startup_profile import startup_timer
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
 import logging
 import os
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,23 +34,120 @@ async def health_check():
     logger.info("Health check endpoint called")
     return {"status": "healthy", "message": "Insights API is running"}
 
+@app.get("/health/startup")
+async def startup_profile():
+    """Seconds from process start to each startup phase"""
+    return {"phases": startup_timer.phases()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage, request and LLM token metrics in the Prometheus text format"""
+    from backend.core.metrics import metrics
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Report per-stage timings in Server-Timing and record request latency"""
+    from backend.core.metrics import collect_timings, http_request_seconds, server_timing_header
+
+    started = time.perf_counter()
+    # Streaming responses only report the stages finished before the headers are sent
+    with collect_timings() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    route = request.scope.get("route")
+    http_request_seconds.observe(
+        elapsed, method=request.method, route=getattr(route, "path", "other"), status=response.status_code
+    )
+    return response
+
 # Create necessary directories on startup
 def create_required_directories():
     directories = [
         "uploads",
         "images/plotly_figures/html",
+        "images/plotly_figures/specs",
+        "images/plotly_figures/assets",
     ]
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
-    
-    # Initialize metadata.json if it doesn't exist
-    metadata_path = "images/plotly_figures/metadata.json"
-    if not os.path.exists(metadata_path):
-        with open(metadata_path, "w") as f:
-            f.write("{}")
 
 create_required_directories()
 
+@app.on_event("startup")
+async def configure_pandas():
+    """Process-wide pandas settings the shared DataFrame cache relies on"""
+    from backend.core.dataframe_cache import enable_copy_on_write
+
+    enable_copy_on_write()
+
+@app.on_event("startup")
+async def warm_sandbox_pool():
+    """Start the code-execution workers without delaying startup"""
+    import asyncio
+    from backend.core.sandbox import sandbox_pool
+
+    if sandbox_pool.enabled:
+        asyncio.get_running_loop().run_in_executor(None, sandbox_pool.start)
+
+@app.on_event("startup")
+async def warm_heavy_imports():
+    """Import plotly, sklearn and openai and load the tokenizer in the background; /health answers meanwhile"""
+    import asyncio
+
+    def warm():
+        from backend.core.llm import get_async_client
+        from backend.core.prompts import load_encoding
+        from backend.graph.tools import warm_up
+        from backend.routers.chat import CHAT_MODEL
+
+        warm_up()
+        get_async_client()
+        load_encoding(CHAT_MODEL)
+        logger.info(f"Heavy imports warmed {startup_timer.mark('imports_warm'):.2f}s after start")
+
+    asyncio.get_running_loop().run_in_executor(None, warm)
+
+@app.on_event("startup")
+async def load_prompt_templates():
+    """Read prompt templates once instead of on every request"""
+    from backend.core.prompts import prompt_templates
+
+    prompt_templates.load()
+
+@app.on_event("startup")
+async def start_chart_collector():
+    """Remove expired charts in the background instead of on each request"""
+    from backend.core.chart_gc import chart_collector
+
+    chart_collector.start()
+
+@app.on_event("startup")
+async def report_startup():
+    """Registered last, so this marks the end of startup"""
+    logger.info(f"Startup complete {startup_timer.mark('startup_complete'):.2f}s after start")
+
+@app.on_event("shutdown")
+async def release_shared_resources():
+    """Close the pooled OpenAI client and stop background executors and workers"""
+    from backend.core.chart_cleanup import chart_registry
+    from backend.core.chart_gc import chart_collector
+    from backend.core.db import database
+    from backend.core.executors import shutdown_executors
+    from backend.core.llm import close_async_client
+    from backend.core.sandbox import sandbox_pool
+    from backend.core.shared_datasets import shared_datasets
+
+    await close_async_client()
+    shutdown_executors()
+    sandbox_pool.shutdown()
+    shared_datasets.release_all()
+    chart_collector.shutdown()
+    chart_registry.flush()
+    database.close()
+
 
 # CORS: allow Next.js dev server (port 3000) and production build
 origins = [
@@ -60,23 +161,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files with error handling
-try:
-    app.mount("/images", StaticFiles(directory="images"), name="images")
-    logger.info("Static files mounted successfully")
-except Exception as e:
-    logger.error(f"Error mounting static files: {str(e)}")
-    # Don't fail startup if static files aren't available yet
+# Charts are only served by /api/charts (ETags, caching headers, compressed
+# variants, access tracking); old /images links are redirected there
+LEGACY_CHART_PREFIXES = {
+    "html": "/api/charts",
+    "specs": "/api/charts/specs",
+    "assets": "/api/charts/assets",
+}
+
+@app.get("/images/plotly_figures/{kind}/{name}")
+async def legacy_chart_url(kind: str, name: str):
+    prefix = LEGACY_CHART_PREFIXES.get(kind)
+    if prefix is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return RedirectResponse(f"{prefix}/{name}", status_code=301)
 
 # Import and mount API routers with error handling
 try:
-    from backend.routers import auth, upload, chat, cleanup
+    from backend.routers import auth, upload, chat, cleanup, charts
     
     app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
     app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
     app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
     app.include_router(cleanup.router, prefix="/api/cleanup", tags=["Cleanup"])
+    app.include_router(charts.router, prefix="/api/charts", tags=["Charts"])
     logger.info("All API routers mounted successfully")
+    startup_timer.mark("routers_mounted")
 except Exception as e:
     logger.error(f"Error mounting API routers: {str(e)}")
     # Don't fail startup if API routers have an issue
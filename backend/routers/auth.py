@@ -1,6 +1,10 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from backend.core.backend import create_user, authenticate_user
+from backend.config import AUTH_REQUIRED, AUTH_TOKEN_TTL_SECONDS
+from backend.core.backend import create_user, authenticate_user, get_user_by_id
+from backend.core.executors import auth_executor, data_executor, run_in
+from backend.core.security import issue_token, user_cache, verify_token
 
 router = APIRouter(prefix="/auth")
 
@@ -8,16 +12,64 @@ class AuthRequest(BaseModel):
     username: str
     password: str
 
+def _token_claims(authorization: str) -> dict:
+    scheme, _, token = authorization.partition(" ")
+    claims = verify_token(token.strip()) if scheme.lower() == "bearer" else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return claims
+
+def _token_username(user, claims: dict, username: Optional[str]) -> str:
+    if user is None or user.username != claims["sub"]:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if username and username != user.username:
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
+    return user.username
+
+def _body_username(username: Optional[str]) -> str:
+    if AUTH_REQUIRED or not username:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    return username
+
+def resolve_username(authorization: Optional[str], username: Optional[str] = None) -> str:
+    """Username for a request: from its bearer token if it sends one.
+
+    Verifying a token is an HMAC check plus a cached user lookup, with no
+    bcrypt and usually no DB query. Requests without a token fall back to the
+    username in the body unless AUTH_REQUIRED is set. May query the DB, so
+    async routes use resolve_username_async instead.
+    """
+    if not authorization:
+        return _body_username(username)
+    claims = _token_claims(authorization)
+    return _token_username(user_cache.get(claims["uid"], get_user_by_id), claims, username)
+
+async def resolve_username_async(authorization: Optional[str], username: Optional[str] = None) -> str:
+    """resolve_username for async routes: users missing from the cache are loaded on data_executor"""
+    if not authorization:
+        return _body_username(username)
+    claims = _token_claims(authorization)
+    user = user_cache.cached(claims["uid"])
+    if user is None:
+        user = await run_in(data_executor, user_cache.get, claims["uid"], get_user_by_id)
+    return _token_username(user, claims, username)
+
 @router.post("/signup")
-def signup(req: AuthRequest):
-    ok = create_user(req.username, req.password)
+async def signup(req: AuthRequest):
+    ok = await run_in(auth_executor, create_user, req.username, req.password)
     if not ok:
         raise HTTPException(status_code=400, detail="Username already exists")
     return {"message": "Signup successful"}
 
 @router.post("/login")
-def login(req: AuthRequest):
-    if not authenticate_user(req.username, req.password):
+async def login(req: AuthRequest):
+    user = await run_in(auth_executor, authenticate_user, req.username, req.password)
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    # TODO: return real JWT
-    return {"token": "dummy-jwt-token"}
\ No newline at end of file
+    user_cache.put(user)
+    return {
+        "token": issue_token(user.id, user.username),
+        "token_type": "bearer",
+        "expires_in": AUTH_TOKEN_TTL_SECONDS,
+        "username": user.username
+    }
@@ -0,0 +1,109 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+import os
+import re
+from backend.core.chart_cleanup import CHARTS_DIR, SPECS_DIR, record_chart_access
+from backend.core.charts import ASSETS_DIR, plotly_js_filename
+from backend.core.precompress import MIN_COMPRESS_BYTES, available_encodings, schedule_precompress, variant_path
+
+router = APIRouter()
+
+# Asset names carry the plotly.js version and chart names are content hashes,
+# so neither ever changes in place
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Older uuid-named charts: cache, but revalidate
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{32}$")
+CHART_NAME = re.compile(r"^[0-9A-Za-z-]{32,36}$")
+
+def _content_tag(chart_id: str):
+    return chart_id if CONTENT_ADDRESSED.match(chart_id) else None
+
+def _accepted_encodings(request: Request) -> set:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def _serve(request: Request, path: str, media_type: str, immutable_tag: str = None) -> Response:
+    """Serve path with an ETag, conditional requests and precompressed variants.
+
+    immutable_tag is given for files whose name pins their content; anything
+    else gets an mtime/size ETag and must be revalidated.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Chart not found")
+
+    if immutable_tag:
+        tag = immutable_tag
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        tag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        cache_control = REVALIDATE_CACHE_CONTROL
+
+    encoding = None
+    accepted = _accepted_encodings(request)
+    for candidate in available_encodings():
+        if candidate in accepted:
+            if os.path.isfile(variant_path(path, candidate)):
+                encoding = candidate
+                break
+            if stat.st_size >= MIN_COMPRESS_BYTES:
+                schedule_precompress(path)  # Ready for the next request
+
+    # Strong ETags differ between encodings of the same resource
+    etag = f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        path = variant_path(path, encoding)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+@router.get("/assets/{name}")
+def plotly_asset(name: str, request: Request):
+    """Serve the shared plotly.js bundle used by lite charts"""
+    if name != plotly_js_filename():
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return _serve(request, os.path.join(ASSETS_DIR, name), "application/javascript", immutable_tag=name)
+
+@router.get("/specs/{name}")
+async def chart_spec(name: str, request: Request):
+    """Serve a chart's JSON spec"""
+    chart_id, ext = os.path.splitext(name)
+    if ext != ".json" or not CHART_NAME.match(chart_id):
+        raise HTTPException(status_code=404, detail="Chart not found")
+    record_chart_access(f"{chart_id}.html")
+    return _serve(request, os.path.join(SPECS_DIR, name), "application/json", _content_tag(chart_id))
+
+@router.get("/{name}")
+async def chart_html(name: str, request: Request):
+    """Serve a chart page; each view keeps the chart from expiring"""
+    chart_id, ext = os.path.splitext(name)
+    if ext != ".html" or not CHART_NAME.match(chart_id):
+        raise HTTPException(status_code=404, detail="Chart not found")
+    # Buffered; written in batches by the chart collector
+    record_chart_access(name)
+    return _serve(request, os.path.join(CHARTS_DIR, name), "text/html", _content_tag(chart_id))
@@ -1,176 +1,452 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+import hashlib
+import json
 import os
-import sqlite3
+import uuid
 import pandas as pd
+from backend.config import CODE_PROMPT_TOKEN_BUDGET, NARRATIVE_TOKEN_BUDGET
 from backend.graph.tools import complete_python_task
+from backend.routers.auth import resolve_username_async
+from backend.core.chart_cleanup import CHARTS_DIR, chart_registry
+from backend.core.charts import load_chart_spec
+from backend.core.db import connection
+from backend.core.dataframe_cache import dataframe_cache, file_sha256, get_dataframe
+from backend.core.execution_cache import execution_cache
+from backend.core.executors import code_executor, data_executor, run_in
+from backend.core.llm import get_async_client
+from backend.core.llm_cache import llm_cache, make_cache_key
+from backend.core.metrics import record_llm_usage, timed
+from backend.core.precompress import schedule_precompress
+from backend.core.prompts import PromptSection, count_tokens, fit_sections, prompt_stats, prompt_templates, schema_variants
+from backend.core.sandbox import sandbox_pool
+from backend.core.shared_datasets import shared_datasets
+from backend.core.variable_store import variable_store
+from backend.core.profiling import load_profile, profile_columns, profile_dataframe, render_profile, save_profile
 import re
-from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 router = APIRouter()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+CHAT_MODEL = "gpt-4"  # Changed from gpt-4o to gpt-4
 
-def generate_human_response(question: str, analysis_result: str, charts: list, df: pd.DataFrame) -> str:
-    # Prepare context for GPT
-    columns_info = list(df.columns)
-    sample_data = df.head(5).to_dict()
+# Part of the LLM cache key; bump when a prompt template below changes
+CODE_PROMPT_VERSION = "2"
+NARRATIVE_PROMPT_VERSION = "2"
+
+NARRATIVE_SYSTEM_PROMPT = "You are a helpful data analyst explaining results to a user in a conversational way."
+
+NARRATIVE_INSTRUCTIONS = """Please provide a detailed, friendly response that:
+1. Uses the actual column names from the dataset
+2. References specific data points from both the results and the dataset profile
+3. Explains the findings in user-friendly terms
+4. Naturally incorporates the generated visualizations
+5. Provides context based on the data structure"""
+
+def build_narrative_messages(question: str, analysis_result: str, charts: list, profile: dict):
+    """Narrative prompt fitted to NARRATIVE_TOKEN_BUDGET; returns (messages, token report)"""
     chart_info = [f"Chart {i+1}: {chart}" for i, chart in enumerate(charts)]
-    
+    # Sample rows were already seen by the code step; the answer rests on the results
+    schema = schema_variants(profile, include_sample=False)
+    sections = [
+        PromptSection("question", [question]),
+        PromptSection("results", [analysis_result], truncatable=True),
+        PromptSection("charts", [str(chart_info)]),
+        PromptSection("schema", schema),
+    ]
+    fixed = count_tokens(NARRATIVE_SYSTEM_PROMPT + NARRATIVE_INSTRUCTIONS, CHAT_MODEL)
+    # The old prompt listed the columns and then the full profile with samples
+    baseline = fixed + sum(count_tokens(text, CHAT_MODEL) for text in (
+        question, analysis_result, str(chart_info), str(profile_columns(profile)), render_profile(profile)
+    ))
+    parts, report = fit_sections(sections, NARRATIVE_TOKEN_BUDGET - fixed, CHAT_MODEL, baseline - fixed)
     prompt = f"""Please provide a detailed, conversational response based on the following data analysis:
 
-Context:
-Dataset Columns: {columns_info}
-Sample Data: {sample_data}
+Dataset:
+{parts["schema"]}
 
-User Question: {question}
+User Question: {parts["question"]}
 
-Analysis Results: {analysis_result}
+Analysis Results: {parts["results"]}
 
-Generated Visualizations: {chart_info}
+Generated Visualizations: {parts["charts"]}
 
-Please provide a detailed, friendly response that:
-1. Uses the actual column names from the dataset
-2. References specific data points from both the results and sample data
-3. Explains the findings in user-friendly terms
-4. Naturally incorporates the generated visualizations
-5. Provides context based on the data structure"""
+{NARRATIVE_INSTRUCTIONS}"""
+    messages = [{"role": "system", "content": NARRATIVE_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}]
+    return messages, _report_prompt("narrative", report, fixed)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",  # Changed from gpt-4o to gpt-4
-            messages=[
-                {"role": "system", "content": "You are a helpful data analyst explaining results to a user in a conversational way."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"OpenAI API Error in generate_human_response: {str(e)}")  # Log the error
-        return f"Error generating human-like response. Technical results: {analysis_result}"
+def _report_prompt(kind: str, report: dict, fixed_tokens: int) -> dict:
+    report = {**report, "tokens": report["tokens"] + fixed_tokens,
+              "baseline_tokens": report["baseline_tokens"] + fixed_tokens}
+    print(f"Backend: {kind} prompt {report['tokens']} tokens (saved {report['saved_tokens']}, compacted {report['compacted']})")
+    return report
 
-class ChatRequest(BaseModel):
-    username: str
-    question: str
+def code_cache_key(system_prompt: str, profile: dict, question: str) -> str:
+    template_version = f"{CODE_PROMPT_VERSION}:{hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]}"
+    return make_cache_key(CHAT_MODEL, template_version, profile["content_hash"], question)
 
-@router.post("/")
-def chat_with_data(req: ChatRequest):
-    conn = sqlite3.connect("users.db")
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT filepath FROM files WHERE username=? ORDER BY uploaded_at DESC LIMIT 1",
-        (req.username,)
-    )
-    row = cur.fetchone()
-    conn.close()
+def narrative_cache_key(question: str, analysis_result: str, charts: list, profile: dict) -> str:
+    # The narrative also depends on what the code printed and how many charts it drew
+    result_hash = hashlib.sha256(f"{analysis_result}\0{len(charts)}".encode("utf-8")).hexdigest()
+    return make_cache_key(CHAT_MODEL, NARRATIVE_PROMPT_VERSION, profile["content_hash"], question, result_hash)
 
-    if not row:
-        raise HTTPException(status_code=404, detail="No CSV uploaded yet.")
+async def cached_completion(key: str, use_cache: bool):
+    if not use_cache:
+        return None
+    with timed("llm_cache_lookup"):
+        return await run_in(data_executor, llm_cache.get, key)
+
+async def store_completion(kind: str, key: str, value: str):
+    await run_in(data_executor, llm_cache.put, key, kind, value)
 
-    filepath = row[0]
+async def generate_human_response(question: str, analysis_result: str, charts: list, profile: dict, use_cache: bool = True) -> str:
+    key = narrative_cache_key(question, analysis_result, charts, profile)
+    cached = await cached_completion(key, use_cache)
+    if cached is not None:
+        return cached
 
-    # Load dataset
+    messages, _ = build_narrative_messages(question, analysis_result, charts, profile)
     try:
-        df = pd.read_csv(filepath)
+        with timed("llm_narrative"):
+            response = await get_async_client().chat.completions.create(
+                model=CHAT_MODEL,
+                messages=messages
+            )
+        record_llm_usage("narrative", response.usage)
+        answer = response.choices[0].message.content
+        await store_completion("narrative", key, answer)
+        return answer
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"OpenAI API Error in generate_human_response: {str(e)}")  # Log the error
+        return f"Error generating human-like response. Technical results: {analysis_result}"
 
-    # System prompt
-    prompt_path = os.path.join(os.path.dirname(__file__), "../prompts/main_prompt.md")
-    try:
-        with open(prompt_path) as f:
-            system_prompt = f.read()
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="main_prompt.md missing")
+async def stream_completion(messages: list, call: str):
+    """Yield content deltas of a streamed chat completion; call labels its token counts"""
+    stream = await get_async_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    async for chunk in stream:
+        # The final chunk carries usage and no choices
+        record_llm_usage(call, getattr(chunk, "usage", None))
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
-    # Build prompt
-    sample = df.head(5).to_dict()
-    prompt = f"{system_prompt}\n\nColumns: {list(df.columns)}\nSample:\n{sample}\n\nUser: {req.question}"
+def build_code_messages(system_prompt: str, profile: dict, question: str):
+    """Code-generation prompt fitted to CODE_PROMPT_TOKEN_BUDGET; returns (messages, token report).
 
-    # Ask GPT
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",  # Changed from gpt-4o to gpt-4
-            messages=[{"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}]
-        )
-        reply = response.choices[0].message.content
-    except Exception as e:
-        print(f"OpenAI API Error: {str(e)}")  # Log the error
-        raise HTTPException(
-            status_code=500, 
-            detail=f"OpenAI API Error: {str(e)}"
-        )
+    The system prompt is sent once, as the system message, and the dataset
+    is described only by its profile rendering.
+    """
+    sections = [
+        PromptSection("question", [question]),
+        PromptSection("schema", schema_variants(profile)),
+    ]
+    fixed = count_tokens(system_prompt, CHAT_MODEL)
+    # The old prompt repeated the system prompt and the column list in the user message
+    baseline = 2 * fixed + sum(count_tokens(text, CHAT_MODEL) for text in (
+        question, str(profile_columns(profile)), render_profile(profile)
+    ))
+    parts, report = fit_sections(sections, CODE_PROMPT_TOKEN_BUDGET - fixed, CHAT_MODEL, baseline - fixed)
+    messages = [{"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Dataset:\n{parts['schema']}\n\nUser: {parts['question']}"}]
+    return messages, _report_prompt("code", report, fixed)
 
-    # Extract Python code
+def extract_python_code(reply: str):
     match = re.search(r"```python(.*?)```", reply, re.DOTALL)
-    python_code = match.group(1).strip() if match else None
-    if not python_code:
-        # Generate helpful suggestions based on the dataset
-        suggestion_prompt = f"""The user asked: "{req.question}"
-        Based on this dataset with columns: {list(df.columns)}, please provide:
+    return match.group(1).strip() if match else None
+
+async def suggest_questions(question: str, profile: dict) -> str:
+    """Explain why a question produced no code and suggest better ones"""
+    suggestion_prompt = f"""The user asked: "{question}"
+        Based on this dataset with columns: {profile_columns(profile)}, please provide:
         1. A brief explanation of why this question might be unclear
         2. 2-3 specific example questions that would work better with this dataset
         Make the response conversational and helpful."""
-        
+
+    with timed("llm_suggest"):
+        suggestion_response = await get_async_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "system", "content": "You are a helpful data analyst"},
+                     {"role": "user", "content": suggestion_prompt}]
+        )
+    record_llm_usage("suggest", suggestion_response.usage)
+    return suggestion_response.choices[0].message.content
+
+class ChatRequest(BaseModel):
+    username: Optional[str] = None  # Taken from the bearer token when one is sent
+    question: str
+    no_cache: bool = False  # Skip cached completions for this request
+    inline_charts: bool = False  # Return chart specs in the response body
+
+def load_chat_context(username: str) -> dict:
+    """Blocking part of a chat request: file lookup, dataset, profile and prompt"""
+    with timed("db_lookup"):
+        # Served by idx_files_username_uploaded_at
+        with connection() as conn:
+            row = conn.execute(
+                "SELECT id, filepath FROM files WHERE username=? ORDER BY uploaded_at DESC, id DESC LIMIT 1",
+                (username,)
+            ).fetchone()
+        profile = load_profile(row[0]) if row else None
+
+    if not row:
+        raise HTTPException(status_code=404, detail="No CSV uploaded yet.")
+
+    file_id, filepath = row
+
+    # Load dataset; sandbox workers load their own copy, so the API process
+    # only needs it when there is no stored profile yet
+    df = None
+    if not sandbox_pool.enabled or profile is None:
         try:
-            suggestion_response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "system", "content": "You are a helpful data analyst"},
-                         {"role": "user", "content": suggestion_prompt}]
-            )
-            suggestions = suggestion_response.choices[0].message.content
-            
-            raise HTTPException(
-                status_code=400, 
-                detail={
-                    "message": "I couldn't generate an analysis for your question.",
-                    "suggestions": suggestions,
-                    "original_question": req.question
-                }
-            )
+            with timed("load_dataset"):
+                df = get_dataframe(filepath)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    # Execute via LangGraph tool
+    # Column profile, computed at upload time; older uploads are profiled once here
+    if profile is None or "content_hash" not in profile:
+        with timed("profile"):
+            profile = profile or profile_dataframe(df)
+            profile["content_hash"] = file_sha256(filepath)
+            save_profile(file_id, profile)
+
+    # System prompt, read once per process
     try:
+        system_prompt = prompt_templates.get("main_prompt.md")
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="main_prompt.md missing")
+
+    return {"filepath": filepath, "df": df, "profile": profile, "system_prompt": system_prompt}
+
+def run_analysis(filepath: str, df: pd.DataFrame, system_prompt: str, question: str, python_code: str, session_id: str, message_id: str, inline_charts: bool = False):
+    """Execute generated code via the LangGraph tool and collect chart paths (and specs)"""
+    with timed("analysis"):
         result, updated_state = complete_python_task.invoke({
             "graph_state": {
                 "input_data": [{"variable_name": "df", "data_path": filepath}],
-                "current_variables": {},
-                "system_prompt": system_prompt
+                "current_variables": {"df": df} if df is not None else {},
+                "system_prompt": system_prompt,
+                "session_id": session_id
             },
-            "thought": req.question,
+            "thought": question,
             "python_code": python_code
         })
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Execution error: {e}")
 
     technical_result = result.strip() if result else "No textual output."
     html_paths = []
     if updated_state.get("output_image_paths"):
         print(f"Backend: Found {len(updated_state['output_image_paths'])} chart paths: {updated_state['output_image_paths']}")
+        # Charts are shared by content; keep them alive while this message refers to them
+        chart_registry.add_references(updated_state["output_image_paths"], session_id, message_id)
         for html_file in updated_state["output_image_paths"]:
-            from backend.core.chart_cleanup import record_chart_access
-            html_path = f"images/plotly_figures/html/{html_file}"
-            record_chart_access(html_file)  # Record that this chart was accessed
-            html_paths.append(html_path)
+            # Compressed copies are usually ready before the first view
+            schedule_precompress(os.path.join(CHARTS_DIR, html_file))
+            html_paths.append(f"api/charts/{html_file}")
         print(f"Backend: Returning {len(html_paths)} chart paths: {html_paths}")
     else:
         print("Backend: No output_image_paths found in updated_state")
+    chart_specs = [load_chart_spec(path) for path in html_paths] if inline_charts else None
+    return technical_result, html_paths, chart_specs
+
+@router.post("/")
+async def chat_with_data(req: ChatRequest, authorization: Optional[str] = Header(None)):
+    username = await resolve_username_async(authorization, req.username)
+    context = await run_in(data_executor, load_chat_context, username)
+    profile = context["profile"]
+    system_prompt = context["system_prompt"]
+
+    # Ask GPT, unless this question was already answered for this dataset
+    code_key = code_cache_key(system_prompt, profile, req.question)
+    reply = await cached_completion(code_key, not req.no_cache)
+    cache_hit = reply is not None
+    if not cache_hit:
+        messages, _ = build_code_messages(system_prompt, profile, req.question)
+        try:
+            with timed("llm_code"):
+                response = await get_async_client().chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=messages
+                )
+            record_llm_usage("code", response.usage)
+            reply = response.choices[0].message.content
+        except Exception as e:
+            print(f"OpenAI API Error: {str(e)}")  # Log the error
+            raise HTTPException(
+                status_code=500,
+                detail=f"OpenAI API Error: {str(e)}"
+            )
+
+    # Extract Python code
+    python_code = extract_python_code(reply)
+    if python_code and not cache_hit:
+        await store_completion("code", code_key, reply)
+    if not python_code:
+        # Generate helpful suggestions based on the dataset
+        try:
+            suggestions = await suggest_questions(req.question, profile)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "I couldn't generate an analysis for your question.",
+                "suggestions": suggestions,
+                "original_question": req.question
+            }
+        )
+
+    # Execute via LangGraph tool
+    message_id = uuid.uuid4().hex
+    try:
+        technical_result, html_paths, chart_specs = await run_in(
+            code_executor, run_analysis,
+            context["filepath"], context["df"], system_prompt, req.question, python_code, username,
+            message_id, req.inline_charts
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Execution error: {e}")
 
     # Generate human-like response
-    human_response = generate_human_response(
+    human_response = await generate_human_response(
         question=req.question,
         analysis_result=technical_result,
         charts=html_paths,
-        df=df
+        profile=profile,
+        use_cache=not req.no_cache
     )
 
-    return {
+    response = {
         "answer": human_response,
         "technical_details": technical_result,  # Keeping original result for reference
-        "charts": html_paths
-    }
\ No newline at end of file
+        "charts": html_paths,
+        "message_id": message_id
+    }
+    if chart_specs is not None:
+        response["chart_specs"] = chart_specs
+    return response
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/stream")
+async def chat_with_data_stream(req: ChatRequest, authorization: Optional[str] = Header(None)):
+    """Server-Sent Events variant of chat_with_data.
+
+    Emits `status`, `code_token`, `code`, `execution`, `charts` and `token`
+    events as each stage finishes, then a final `done` event carrying the same
+    payload as the non-streaming endpoint. Failures after the stream has
+    started are reported as an `error` event.
+    """
+    username = await resolve_username_async(authorization, req.username)
+    context = await run_in(data_executor, load_chat_context, username)
+    profile = context["profile"]
+    system_prompt = context["system_prompt"]
+
+    async def events():
+        yield _sse("status", {"stage": "generating_code"})
+        code_key = code_cache_key(system_prompt, profile, req.question)
+        reply = await cached_completion(code_key, not req.no_cache)
+        cache_hit = reply is not None
+        if cache_hit:
+            yield _sse("code_token", {"text": reply, "cached": True})
+        else:
+            messages, _ = build_code_messages(system_prompt, profile, req.question)
+            reply_parts = []
+            try:
+                with timed("llm_code"):
+                    async for delta in stream_completion(messages, "code"):
+                        reply_parts.append(delta)
+                        yield _sse("code_token", {"text": delta})
+            except Exception as e:
+                print(f"OpenAI API Error: {str(e)}")  # Log the error
+                yield _sse("error", {"message": f"OpenAI API Error: {str(e)}"})
+                return
+            reply = "".join(reply_parts)
+
+        python_code = extract_python_code(reply)
+        if python_code and not cache_hit:
+            await store_completion("code", code_key, reply)
+        if not python_code:
+            try:
+                suggestions = await suggest_questions(req.question, profile)
+            except Exception as e:
+                yield _sse("error", {"message": str(e)})
+                return
+            yield _sse("error", {
+                "message": "I couldn't generate an analysis for your question.",
+                "suggestions": suggestions,
+                "original_question": req.question
+            })
+            return
+        yield _sse("code", {"code": python_code})
+
+        yield _sse("status", {"stage": "executing"})
+        message_id = uuid.uuid4().hex
+        try:
+            technical_result, html_paths, chart_specs = await run_in(
+                code_executor, run_analysis,
+                context["filepath"], context["df"], system_prompt, req.question, python_code, username,
+                message_id, req.inline_charts
+            )
+        except Exception as e:
+            yield _sse("error", {"message": f"Execution error: {e}"})
+            return
+        yield _sse("execution", {"output": technical_result})
+        if html_paths:
+            charts_event = {"charts": html_paths}
+            if chart_specs is not None:
+                charts_event["chart_specs"] = chart_specs
+            yield _sse("charts", charts_event)
+
+        yield _sse("status", {"stage": "writing_answer"})
+        narrative_key = narrative_cache_key(req.question, technical_result, html_paths, profile)
+        answer = await cached_completion(narrative_key, not req.no_cache)
+        if answer is not None:
+            yield _sse("token", {"text": answer, "cached": True})
+        else:
+            messages, _ = build_narrative_messages(req.question, technical_result, html_paths, profile)
+            answer_parts = []
+            try:
+                with timed("llm_narrative"):
+                    async for delta in stream_completion(messages, "narrative"):
+                        answer_parts.append(delta)
+                        yield _sse("token", {"text": delta})
+                answer = "".join(answer_parts)
+                await store_completion("narrative", narrative_key, answer)
+            except Exception as e:
+                print(f"OpenAI API Error in chat stream: {str(e)}")  # Log the error
+                answer = "".join(answer_parts) or f"Error generating human-like response. Technical results: {technical_result}"
+
+        yield _sse("done", {
+            "answer": answer,
+            "technical_details": technical_result,
+            "charts": html_paths,
+            "message_id": message_id
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache-stats")
+def cache_stats():
+    return {
+        "dataframes": dataframe_cache.stats(),
+        "llm": llm_cache.stats(),
+        "execution": execution_cache.stats(),
+        "prompts": prompt_stats.stats(),
+        "variables": variable_store.stats(),
+        "sandbox": sandbox_pool.stats(),
+        "shared_datasets": shared_datasets.stats()
+    }
@@ -2,25 +2,36 @@ from fastapi import APIRouter, HTTPException
 import os
 import shutil
 
+from backend.core.chart_cleanup import chart_registry
+from backend.core.chart_gc import chart_collector
+
 router = APIRouter()
 
 @router.post("/reload")
 async def handle_page_reload():
     """Handle page reload by cleaning up all charts"""
-    charts_dir = "images/plotly_figures/html"
-    metadata_file = "images/plotly_figures/metadata.json"
+    charts_dirs = ["images/plotly_figures/html", "images/plotly_figures/specs"]
     
     try:
-        # Remove and recreate the charts directory
-        if os.path.exists(charts_dir):
-            shutil.rmtree(charts_dir)
-        os.makedirs(charts_dir, exist_ok=True)
+        # Remove and recreate the chart and spec directories
+        for charts_dir in charts_dirs:
+            if os.path.exists(charts_dir):
+                shutil.rmtree(charts_dir)
+            os.makedirs(charts_dir, exist_ok=True)
         
-        # Clear the metadata file
-        if os.path.exists(metadata_file):
-            with open(metadata_file, "w") as f:
-                f.write("{}")
+        # Forget the removed charts
+        chart_registry.clear()
                 
         return {"message": "Charts cleaned up successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats")
+async def cleanup_stats():
+    """Chart and reference counts and the background collector's last sweep"""
+    return {"registry": chart_registry.stats(), "collector": chart_collector.stats()}
+
+@router.post("/sessions/{session_id}/release")
+async def release_session_charts(session_id: str):
+    """Drop a session's chart references so its charts can expire"""
+    return {"released": chart_registry.release_session(session_id)}
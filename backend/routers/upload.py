@@ -1,96 +1,187 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-import os
-import shutil
-import sqlite3
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
+from typing import Optional
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from backend.config import INGEST_CHUNK_ROWS
+from backend.core.blob_store import blob_store
+from backend.core.columnar import ColumnarWriter
+from backend.core.db import connection
+from backend.core.metrics import timed
+from backend.core.profiling import DatasetProfiler, save_profile
+from backend.routers.auth import resolve_username
 
 router = APIRouter()
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-def validate_csv(df: pd.DataFrame) -> tuple[bool, list[str]]:
-    issues = []
-
-    # Check for infinite values
+def find_inf_columns(df: pd.DataFrame) -> list[str]:
     numeric_cols = df.select_dtypes(include=np.number).columns
-    if not numeric_cols.empty:
-        inf_columns = numeric_cols[np.isinf(df[numeric_cols]).any()].tolist()
-        if inf_columns:
-            issues.append(f"Infinite values found in columns: {', '.join(inf_columns)}")
+    if numeric_cols.empty:
+        return []
+    return numeric_cols[np.isinf(df[numeric_cols]).any()].tolist()
 
-    # Check column names for special characters
-    special_char_columns = [col for col in df.columns if not col.replace('_', '').replace(' ', '').isalnum()]
-    if special_char_columns:
-        issues.append(f"Special characters found in column names: {', '.join(special_char_columns)}")
+def find_special_char_columns(columns) -> list[str]:
+    return [col for col in columns if not str(col).replace('_', '').replace(' ', '').isalnum()]
 
-    # Check for mixed data types in numeric columns
-    for col in numeric_cols:
+def find_mixed_type_columns(df: pd.DataFrame) -> list[str]:
+    mixed = []
+    for col in df.select_dtypes(include=np.number).columns:
         if pd.api.types.is_numeric_dtype(df[col]):
             non_numeric = df[col].apply(lambda x: not (pd.isna(x) or isinstance(x, (int, float))))
             if non_numeric.any():
-                issues.append(f"Mixed data types found in numeric column: {col}")
+                mixed.append(col)
+    return mixed
 
+def format_issues(inf_columns, special_char_columns, mixed_type_columns) -> list[str]:
+    issues = []
+    if inf_columns:
+        issues.append(f"Infinite values found in columns: {', '.join(inf_columns)}")
+    if special_char_columns:
+        issues.append(f"Special characters found in column names: {', '.join(special_char_columns)}")
+    for col in mixed_type_columns:
+        issues.append(f"Mixed data types found in numeric column: {col}")
+    return issues
+
+def validate_csv(df: pd.DataFrame) -> tuple[bool, list[str]]:
+    issues = format_issues(
+        find_inf_columns(df),
+        find_special_char_columns(df.columns),
+        find_mixed_type_columns(df),
+    )
     return len(issues) == 0, issues
 
+def _merge_columns(seen: list, new) -> None:
+    for col in new:
+        if col not in seen:
+            seen.append(col)
+
+def ingest_csv(csv_path: Path, content_hash: str) -> dict:
+    """Parse a stored CSV upload in chunks, validating and profiling it.
+
+    Nulls, infinite values and validation issues are accumulated chunk by
+    chunk, the Arrow copy is appended as we go and the preview comes from the
+    first chunk, so peak memory is bounded by INGEST_CHUNK_ROWS rather than
+    by the size of the file.
+    """
+    columnar = ColumnarWriter(csv_path)
+    profiler = DatasetProfiler()
+    null_columns, inf_columns, mixed_type_columns = [], [], []
+    null_counts, inf_counts = {}, {}
+    preview, columns = None, []
+    row_count = 0
+
+    try:
+        with pd.read_csv(csv_path, chunksize=INGEST_CHUNK_ROWS) as reader:
+            for chunk in reader:
+                if preview is None:
+                    columns = list(chunk.columns)
+                row_count += len(chunk)
+                columnar.write(chunk)
+
+                chunk_inf = find_inf_columns(chunk)
+                for col in chunk_inf:
+                    inf_counts[col] = inf_counts.get(col, 0) + int(np.isinf(chunk[col]).sum())
+                _merge_columns(inf_columns, chunk_inf)
+
+                # Clean inf values and track nulls before replacing
+                chunk = chunk.replace([np.inf, -np.inf], np.nan)
+                chunk_nulls = chunk.isnull().sum()
+                for col, count in chunk_nulls[chunk_nulls > 0].items():
+                    null_counts[col] = null_counts.get(col, 0) + int(count)
+                _merge_columns(null_columns, chunk_nulls[chunk_nulls > 0].index)
+                profiler.update(chunk)
+
+                # Replace nulls with "null" string for consistency
+                chunk = chunk.fillna("null")
+                _merge_columns(mixed_type_columns, find_mixed_type_columns(chunk))
+
+                if preview is None:
+                    preview = chunk.head(5).to_dict(orient="records")
+    except Exception:
+        columnar.abort()
+        raise
+
+    # Typed columnar copy so later readers skip CSV parsing
+    columnar.close()
+
+    issues = format_issues(inf_columns, find_special_char_columns(columns), mixed_type_columns)
+    return {
+        "is_valid": len(issues) == 0,
+        "issues": issues,
+        "null_columns": null_columns,
+        "null_counts": null_counts,
+        "inf_counts": inf_counts,
+        "preview": preview or [],
+        "columns": columns,
+        "row_count": row_count,
+        "profile": {**profiler.finalize(), "content_hash": content_hash},
+    }
+
+def ingest_blob(temp_path: Path, content_hash: str, size: int):
+    """Ingest summary for uploaded content, parsing it only if it is new.
+
+    Returns (summary, deduplicated).
+    """
+    with blob_store.lock(content_hash):
+        summary = blob_store.lookup(content_hash)
+        if summary is not None:
+            blob_store.discard(temp_path)
+            return summary, True
+        path = blob_store.store(temp_path, content_hash)
+        try:
+            summary = ingest_csv(path, content_hash)
+        except Exception:
+            blob_store.remove(content_hash)
+            raise
+        blob_store.record(content_hash, size, summary)
+        return summary, False
+
 @router.post("/")
 def upload_file(
-    username: str = Form(...),
-    file: UploadFile = File(...)
+    username: Optional[str] = Form(None),
+    file: UploadFile = File(...),
+    authorization: Optional[str] = Header(None)
 ):
+    username = resolve_username(authorization, username)
     if not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed.")
 
-    file_path = UPLOAD_DIR / file.filename
-
-    # Save file temporarily
-    temp_path = UPLOAD_DIR / f"temp_{file.filename}"
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Validate CSV
+    temp_path = None
     try:
-        df = pd.read_csv(temp_path, low_memory=False)
-
-        # Clean inf values
-        df = df.replace([np.inf, -np.inf], np.nan)
-
-        # Track null columns before replacing
-        null_columns = df.columns[df.isnull().any()].tolist()
-
-        # Replace nulls with "null" string for consistency
-        df = df.fillna("null")
-
-        is_valid, issues = validate_csv(df)
-
-        preview = df.head(5).to_dict(orient="records")
-        columns = list(df.columns)
-
-        # Always move file even if cleaning was required
-        shutil.move(temp_path, file_path)
+        # Hash while the body is copied to disk; known content is not parsed again
+        with timed("upload_receive"):
+            temp_path, content_hash, size = blob_store.receive(file.file)
+        with timed("upload_ingest"):
+            result, deduplicated = ingest_blob(temp_path, content_hash, size)
+        null_columns = result["null_columns"]
 
         # Persist in DB
-        conn = sqlite3.connect("users.db")
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO files (username, filename, filepath) VALUES (?,?,?)",
-            (username, file.filename, str(file_path))
-        )
-        conn.commit()
-        conn.close()
+        with timed("db_insert"), connection() as conn:
+            file_id = conn.execute(
+                "INSERT INTO files (username, filename, filepath, content_hash) VALUES (?,?,?,?)",
+                (username, file.filename, str(blob_store.path_for(content_hash)), content_hash)
+            ).lastrowid
+
+        # Profiled once per distinct content, so prompts never have to touch the data
+        with timed("profile_save"):
+            save_profile(file_id, result["profile"])
 
         return {
             "status": "success",
             "message": "File uploaded successfully. Missing values were filled with 'null' to ensure consistency." if null_columns else "File uploaded successfully.",
             "filled_null_columns": null_columns,
             "filename": file.filename,
-            "preview": preview,
-            "columns": columns
+            "preview": result["preview"],
+            "columns": result["columns"],
+            "row_count": result["row_count"],
+            "issues": result["issues"],
+            "content_hash": content_hash,
+            "deduplicated": deduplicated
         }
 
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        raise HTTPException(status_code=500, detail=f"CSV read error: {e}")
\ No newline at end of file
+        if temp_path is not None:
+            blob_store.discard(temp_path)
+        raise HTTPException(status_code=500, detail=f"CSV read error: {e}")
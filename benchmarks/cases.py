@@ -0,0 +1,173 @@
+"""Benchmarked hot paths.
+
+Each case is set up once per dataset size and returns (run, before): run is
+timed, before (optional) runs untimed ahead of every repetition to reset
+state. backend modules are imported inside the setups, after run.py has
+pointed the app at its scratch workspace.
+"""
+import os
+import shutil
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datasets import synthetic_frame, write_csv
+
+TRIVIAL_CODE = "result = len(df)\nprint(result)"
+
+
+class Benchmark:
+    def __init__(self, name: str, setup, max_rows: int):
+        self.name = name
+        self.setup = setup
+        self.max_rows = max_rows
+
+
+def validate_csv_case(rows: int, data_dir: str):
+    from backend.routers.upload import validate_csv
+
+    df = pd.read_csv(write_csv(rows, data_dir))
+    return (lambda: validate_csv(df)), None
+
+
+def _forget_uploads():
+    from backend.core.blob_store import blob_store
+    from backend.core.db import connection
+
+    with connection() as conn:
+        conn.execute("DELETE FROM file_profiles")
+        conn.execute("DELETE FROM files")
+        conn.execute("DELETE FROM blobs")
+    shutil.rmtree(blob_store.root, ignore_errors=True)
+
+
+def _upload(path: str):
+    from fastapi import UploadFile
+    from backend.routers.upload import upload_file
+
+    with open(path, "rb") as f:
+        return upload_file(username="bench", file=UploadFile(file=f, filename="bench.csv"), authorization=None)
+
+
+def upload_ingest_case(rows: int, data_dir: str):
+    """Full ingest of new content: hashing, parsing, validation, Arrow copy and profile"""
+    path = write_csv(rows, data_dir)
+    return (lambda: _upload(path)), _forget_uploads
+
+
+def upload_dedup_case(rows: int, data_dir: str):
+    """Re-upload of known content, which skips ingest"""
+    path = write_csv(rows, data_dir)
+    _upload(path)
+    return (lambda: _upload(path)), None
+
+
+def serialize_state_case(rows: int, data_dir: str):
+    from langchain_core.messages import AIMessage, HumanMessage
+    from backend.core.data_models import InputData
+    from backend.graph.state import serialize_state
+
+    df = synthetic_frame(rows)
+    state = {
+        "messages": [HumanMessage(content="What are total sales by region?"), AIMessage(content="Sales by region:")],
+        "input_data": [InputData("df", "bench.csv", "Synthetic sales")],
+        "intermediate_outputs": [{"thought": "sum by region", "code": TRIVIAL_CODE, "output": df.head(20).to_string()}],
+        "current_variables": {
+            "df": df,
+            "total": np.float64(df["amount"].sum()),
+            "by_region": df.groupby("region")["amount"].sum(),
+        },
+        "output_image_paths": [],
+    }
+    return (lambda: serialize_state(state)), None
+
+
+def json_encoder_case(rows: int, data_dir: str):
+    """CustomJSONEncoder over numpy scalars, dates and NaN, as in tool output"""
+    import json
+    from backend.graph.tools import CustomJSONEncoder
+
+    df = synthetic_frame(rows)
+    records = [
+        {"order_id": np.int64(i), "amount": np.float64(a), "quantity": np.int32(q), "day": date(2024, 1, 1 + i % 28)}
+        for i, a, q in zip(df["order_id"], df["amount"], df["quantity"])
+    ]
+    return (lambda: json.dumps(records, cls=CustomJSONEncoder)), None
+
+
+def clean_persistent_vars_case(rows: int, data_dir: str):
+    from backend.graph.tools import clean_persistent_vars
+
+    df = synthetic_frame(rows)
+    variables = {}
+
+    def before():
+        # serialize_variable converts object columns in place; start from fresh copies
+        variables.clear()
+        variables.update({
+            "summary": df.copy(),
+            "categories": df["category"].copy(),
+            "total": np.int64(rows),
+            "month": pd.Period("2024-01", "M"),
+            "regions": ["north", "south"],
+        })
+
+    return (lambda: clean_persistent_vars(variables)), before
+
+
+def _python_task(rows: int, data_dir: str, cache_bytes: int):
+    from backend.core.execution_cache import execution_cache
+    from backend.graph.tools import complete_python_task
+
+    execution_cache.max_bytes = cache_bytes
+    payload = {
+        "graph_state": {
+            "input_data": [{"variable_name": "df", "data_path": write_csv(rows, data_dir)}],
+            "current_variables": {},
+            "session_id": "bench",
+        },
+        "thought": "benchmark",
+        "python_code": TRIVIAL_CODE,
+    }
+    return (lambda: complete_python_task.invoke(payload)), None
+
+
+def python_task_case(rows: int, data_dir: str):
+    """Overhead of running trivial code (dataset already cached, no result cache)"""
+    return _python_task(rows, data_dir, cache_bytes=0)
+
+
+def python_task_cached_case(rows: int, data_dir: str):
+    return _python_task(rows, data_dir, cache_bytes=256 * 1024 ** 2)
+
+
+def save_charts_case(rows: int, data_dir: str):
+    """The chart-saving block generated code runs, for one scatter of rows points"""
+    import plotly.graph_objects as go
+    from backend.core.chart_cleanup import CHARTS_DIR, SPECS_DIR
+    from backend.graph.tools import plotly_html_saving_code
+
+    df = synthetic_frame(rows)
+    figure = go.Figure(go.Scattergl(x=df["order_id"], y=df["amount"], mode="markers"))
+
+    def before():
+        # Charts are content-addressed and not rewritten; remove them so every run saves
+        for directory in (CHARTS_DIR, SPECS_DIR):
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+
+    return (lambda: exec(plotly_html_saving_code, {"plotly_figures": [figure]})), before
+
+
+BENCHMARKS = [
+    Benchmark("validate_csv", validate_csv_case, max_rows=10_000_000),
+    Benchmark("upload_ingest", upload_ingest_case, max_rows=10_000_000),
+    Benchmark("upload_dedup", upload_dedup_case, max_rows=10_000_000),
+    Benchmark("serialize_state", serialize_state_case, max_rows=1_000_000),
+    Benchmark("json_encoder", json_encoder_case, max_rows=1_000_000),
+    Benchmark("clean_persistent_vars", clean_persistent_vars_case, max_rows=10_000_000),
+    Benchmark("python_task", python_task_case, max_rows=10_000_000),
+    Benchmark("python_task_cached", python_task_cached_case, max_rows=10_000_000),
+    Benchmark("save_charts", save_charts_case, max_rows=1_000_000),
+]
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [f"category_{i}" for i in range(20)]
+REGIONS = ["north", "south", "east", "west", "central"]
+# Rows generated and written per step, so 10M-row files fit in memory
+WRITE_CHUNK_ROWS = 1_000_000
+
+
+def synthetic_frame(rows: int, seed: int = 0, start: int = 0) -> pd.DataFrame:
+    """Sales-like table: ids, two text columns, floats with nulls, ints and dates"""
+    rng = np.random.default_rng(seed + start)
+    amount = rng.gamma(2.0, 50.0, rows).round(2)
+    amount[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "order_id": np.arange(start, start + rows),
+        "category": np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), rows)],
+        "region": np.array(REGIONS)[rng.integers(0, len(REGIONS), rows)],
+        "amount": amount,
+        "quantity": rng.integers(1, 50, rows),
+        "order_date": (np.datetime64("2023-01-01") + rng.integers(0, 730, rows).astype("timedelta64[D]")).astype(str),
+    })
+
+
+def write_csv(rows: int, directory: str) -> str:
+    """Write (once) and return the path of a synthetic CSV with rows rows"""
+    path = os.path.join(directory, f"synthetic_{rows}.csv")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    for start in range(0, rows, WRITE_CHUNK_ROWS):
+        chunk = synthetic_frame(min(WRITE_CHUNK_ROWS, rows - start), start=start)
+        chunk.to_csv(tmp_path, mode="a" if start else "w", header=not start, index=False)
+    os.replace(tmp_path, path)
+    return path
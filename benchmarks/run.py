@@ -0,0 +1,164 @@
+"""Offline micro-benchmarks for the ingest, serialization and chart hot paths.
+
+    python -m benchmarks.run                       # compare against baseline.json
+    python -m benchmarks.run --sizes 10k,100k      # quick run on the small inputs
+    python -m benchmarks.run --only upload_ingest,save_charts
+    python -m benchmarks.run --update-baseline     # record the current timings
+
+Each case runs on synthetic data in a scratch workspace (its own users.db,
+uploads and chart directories) and never calls the network. The best of
+several repetitions is reported. The run fails (exit status 1) when a metric
+is slower than its baseline by more than the threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = "10k,100k,1m,10m"
+DEFAULT_THRESHOLD = 0.25
+# Differences below this are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.002
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def format_size(rows: int) -> str:
+    for suffix, factor in (("m", 1_000_000), ("k", 1_000)):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+
+def repetitions(rows: int, requested: int) -> int:
+    # Large inputs are slow enough that fewer runs are stable
+    if rows >= 10_000_000:
+        return 1
+    if rows >= 1_000_000:
+        return min(requested, 3)
+    return requested
+
+
+def prepare_workspace(path: str):
+    """Run the app against a scratch directory instead of the real data"""
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    os.environ["DATABASE_PATH"] = os.path.join(path, "users.db")
+    os.environ["SANDBOX_WORKERS"] = "0"
+    os.environ["EXECUTION_CACHE_MAX_BYTES"] = "0"
+    for directory in ("uploads", "images/plotly_figures/html", "images/plotly_figures/specs",
+                      "images/plotly_figures/assets"):
+        os.makedirs(directory, exist_ok=True)
+
+
+def time_case(benchmark, rows: int, data_dir: str, repeat: int) -> float:
+    timings = []
+    # The app prints progress; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        run, before = benchmark.setup(rows, data_dir)
+        for _ in range(repetitions(rows, repeat) + 1):  # the first run warms up
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+    return min(timings[1:])
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"results": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Metrics slower than baseline by more than threshold, as (metric, seconds, baseline seconds)"""
+    regressions = []
+    for metric, seconds in results.items():
+        reference = baseline.get("results", {}).get(metric)
+        if reference is None:
+            continue
+        if seconds > reference * (1 + threshold) and seconds - reference > MIN_REGRESSION_SECONDS:
+            regressions.append((metric, seconds, reference))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"row counts, e.g. 10k,1m (default {DEFAULT_SIZES})")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (fewer for 1M+ rows)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, help="allowed slowdown as a fraction (default: the baseline's, or 0.25)")
+    parser.add_argument("--update-baseline", action="store_true", help="write the timings to the baseline file")
+    parser.add_argument("--workspace", help="scratch directory (default: a new temporary directory)")
+    args = parser.parse_args(argv)
+
+    baseline_path = os.path.abspath(args.baseline)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    prepare_workspace(os.path.abspath(args.workspace) if args.workspace else tempfile.mkdtemp(prefix="insights-bench-"))
+    data_dir = os.path.join(os.getcwd(), "data")
+
+    from backend.core.dataframe_cache import enable_copy_on_write
+    from benchmarks.cases import BENCHMARKS
+
+    enable_copy_on_write()
+
+    selected = set(args.only.split(",")) if args.only else None
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    baseline = load_baseline(baseline_path)
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+
+    results = {}
+    print(f"{'benchmark':<28} {'rows':>6} {'best ms':>11} {'baseline ms':>12} {'change':>8}")
+    for benchmark in BENCHMARKS:
+        if selected is not None and benchmark.name not in selected:
+            continue
+        for rows in sizes:
+            if rows > benchmark.max_rows:
+                continue
+            metric = f"{benchmark.name}[{format_size(rows)}]"
+            seconds = time_case(benchmark, rows, data_dir, args.repeat)
+            results[metric] = seconds
+            reference = baseline.get("results", {}).get(metric)
+            change = f"{(seconds / reference - 1) * 100:+.0f}%" if reference else "new"
+            reference_ms = f"{reference * 1000:.2f}" if reference else "-"
+            print(f"{benchmark.name:<28} {format_size(rows):>6} {seconds * 1000:>11.2f} {reference_ms:>12} {change:>8}")
+
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update({k: round(v, 6) for k, v in results.items()})
+        baseline["threshold"] = threshold
+        baseline["machine"] = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        }
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, threshold)
+    for metric, seconds, reference in regressions:
+        print(f"REGRESSION {metric}: {seconds * 1000:.2f} ms vs {reference * 1000:.2f} ms baseline "
+              f"(allowed +{threshold * 100:.0f}%)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
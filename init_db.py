@@ -1,31 +1,16 @@
 import sqlite3
 import os
 
+from backend.core.db import migrate
+
 db_path = os.path.join(os.path.dirname(__file__), "users.db")
 conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# Create users table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password_hash TEXT NOT NULL
-)
-''')
+conn.execute("PRAGMA journal_mode=WAL")
 
-# Create files table with filename
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS files (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT NOT NULL,
-    filename TEXT NOT NULL,
-    filepath TEXT NOT NULL,
-    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-''')
+# Create or upgrade the `users`, `files` and `file_profiles` tables and their
+# indexes; the schema itself lives in backend/core/db.py (MIGRATIONS)
+version = migrate(conn)
 
-conn.commit()
 conn.close()
 
-print("✅ Database initialized with `users` and `files` tables.")
+print(f"✅ Database initialized at schema version {version} (`users`, `files` and `file_profiles` tables).")
@@ -7,7 +7,7 @@ import { Button } from "@/components/ui/button"
 import { Textarea } from "@/components/ui/textarea"
 import { UploadCloud, Send, FileText } from "lucide-react"
 import { uploadCsv } from "@/lib/api"
-import { sendChat } from "@/lib/api"
+import { streamChat } from "@/lib/api"
 
 interface Message {
   id: string
@@ -165,40 +165,40 @@ export default function DataChatApp() {
     setInput("")
     setIsChatting(true)
 
+    // The answer is filled in as the stream arrives
+    const aiMessageId = generateUniqueId()
+    const updateAiMessage = (update: Partial<Message>) =>
+      setMessages((prev) => prev.map((m) => (m.id === aiMessageId ? { ...m, ...update } : m)))
+    setMessages((prev) => [...prev, { id: aiMessageId, type: "ai", content: "Analyzing your data...", timestamp: new Date() }])
+
     try {
-      const data = await sendChat(userMessage.content, "guest");
-      console.log("Frontend: Received data from backend:", data);
-      console.log("Frontend: Charts data:", data.charts);
-      const aiMessage: Message = {
-        id: generateUniqueId(),
-        type: "ai",
-        content: data.answer,
-        charts: data.charts,
-        timestamp: new Date(),
-      }
-      setMessages((prev) => [...prev, aiMessage])
+      let answer = ""
+      await streamChat(
+        userMessage.content,
+        ({ event, data }) => {
+          if (event === "charts") {
+            updateAiMessage({ charts: data.charts })
+          } else if (event === "token") {
+            answer += data.text
+            updateAiMessage({ content: answer })
+          } else if (event === "done") {
+            updateAiMessage({ content: data.answer, charts: data.charts, timestamp: new Date() })
+          } else if (event === "error") {
+            updateAiMessage({
+              content: data.suggestions || `Sorry, I encountered an error: ${data.message}. Please try again.`,
+              timestamp: new Date(),
+            })
+          }
+        },
+        "guest",
+      )
     } catch (error: any) {
       console.error("Chat error:", error);
-      let errorMessage: Message;
-      
-      if (error?.response?.status === 400 && error?.response?.data?.suggestions) {
-        errorMessage = {
-          id: generateUniqueId(),
-          type: "ai",
-          content: error.response.data.suggestions,
-          timestamp: new Date(),
-        };
-      } else {
-        // Try to get a more detailed error message
-        const errorDetail = error.message || error.toString();
-        errorMessage = {
-          id: generateUniqueId(),
-          type: "ai",
-          content: `Sorry, I encountered an error: ${errorDetail}. Please try again.`,
-          timestamp: new Date(),
-        };
-      }
-      setMessages((prev) => [...prev, errorMessage])
+      const errorDetail = error.message || error.toString();
+      updateAiMessage({
+        content: `Sorry, I encountered an error: ${errorDetail}. Please try again.`,
+        timestamp: new Date(),
+      })
     } finally {
       setIsChatting(false)
     }
@@ -1,5 +1,14 @@
 const API = process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000";
 
+// Bearer token from /api/auth/auth/login; without one the backend falls back
+// to the username in the request body
+export const TOKEN_STORAGE_KEY = "insights_token";
+
+function authHeaders(): Record<string, string> {
+  const token = typeof window === "undefined" ? null : window.localStorage.getItem(TOKEN_STORAGE_KEY);
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
+
 export async function uploadCsv(file: File, username = "guest") {
   const form = new FormData();
   form.append("file", file);
@@ -7,6 +16,7 @@ export async function uploadCsv(file: File, username = "guest") {
 
   const res = await fetch(`${API}/api/upload/`, {
     method: "POST",
+    headers: authHeaders(),
     body: form,
   });
   if (!res.ok) throw new Error(await res.text());
@@ -17,7 +27,7 @@ export async function sendChat(question: string, username = "guest") {
   try {
     const res = await fetch(`${API}/api/chat/`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", ...authHeaders() },
       body: JSON.stringify({ username, question }),
     });
     
@@ -31,4 +41,47 @@ export async function sendChat(question: string, username = "guest") {
     console.error("Chat API Error:", error);
     throw error;
   }
-}
\ No newline at end of file
+}
+
+export type ChatStreamEvent = {
+  event: string;
+  data: any;
+};
+
+// Streams /api/chat/stream Server-Sent Events: status, code_token, code,
+// execution, charts, token, then done (or error).
+export async function streamChat(
+  question: string,
+  onEvent: (evt: ChatStreamEvent) => void,
+  username = "guest",
+) {
+  const res = await fetch(`${API}/api/chat/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream", ...authHeaders() },
+    body: JSON.stringify({ username, question }),
+  });
+  if (!res.ok || !res.body) {
+    throw new Error((await res.text()) || "Failed to get response from server");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      onEvent({ event, data: data ? JSON.parse(data) : null });
+    }
+  }
+}
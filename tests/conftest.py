@@ -0,0 +1,62 @@
+"""Run the app against a scratch workspace: its own users.db, caches, uploads
+and chart directories, with generated code executed in-process."""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+WORKSPACE = tempfile.mkdtemp(prefix="insights-tests-")
+
+# backend.config reads these on import, so they are set before any test module loads
+os.environ.update({
+    "DATABASE_PATH": os.path.join(WORKSPACE, "users.db"),
+    "LLM_CACHE_PATH": os.path.join(WORKSPACE, "cache", "llm_cache.db"),
+    "CHART_REGISTRY_PATH": os.path.join(WORKSPACE, "cache", "charts.db"),
+    "AGENT_CHECKPOINT_PATH": os.path.join(WORKSPACE, "cache", "agent_checkpoints.db"),
+    "UPLOAD_BLOB_DIR": os.path.join(WORKSPACE, "uploads", "blobs"),
+    "VARIABLE_SPILL_DIR": os.path.join(WORKSPACE, "cache", "spill"),
+    "SHARED_DATASET_DIR": WORKSPACE,
+    "SANDBOX_WORKERS": "0",
+    "OPENAI_API_KEY": "test",
+})
+
+
+@pytest.fixture(scope="session", autouse=True)
+def workspace():
+    """Chart, upload and image directories are relative to the working directory"""
+    from backend.core.dataframe_cache import enable_copy_on_write
+
+    enable_copy_on_write()
+    previous = os.getcwd()
+    os.chdir(WORKSPACE)
+    yield WORKSPACE
+    os.chdir(previous)
+
+
+@pytest.fixture
+def session_id():
+    return f"test-{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,x\n2,y\n3,z\n")
+    return str(path)
+
+
+@pytest.fixture
+def offline_tiktoken(monkeypatch):
+    """tiktoken installed but unable to download its encodings"""
+    tiktoken = pytest.importorskip("tiktoken")
+    from backend.core.prompts import _encoding
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("no network access")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", unavailable)
+    monkeypatch.setattr(tiktoken, "encoding_for_model", unavailable)
+    _encoding.cache_clear()
+    yield
+    _encoding.cache_clear()
@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from backend.core.backend import PythonChatbot
+from backend.core.data_models import InputData
+from backend.graph import nodes
+
+
+class ScriptedModel:
+    """Stands in for the tool-bound chat model: runs each user message as code, then reports the output"""
+
+    def invoke(self, inputs):
+        last = inputs["messages"][-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Result: {last.content}")
+        call = {"name": "complete_python_task", "id": f"call-{len(inputs['messages'])}",
+                "args": {"thought": "run it", "python_code": last.content}}
+        return AIMessage(content="", tool_calls=[call])
+
+
+@pytest.fixture(autouse=True)
+def scripted_model(monkeypatch, offline_tiktoken):
+    monkeypatch.setattr(nodes, "get_model", lambda: ScriptedModel())
+
+
+@pytest.fixture
+def inputs(csv_path):
+    return [InputData("df", csv_path, "test data")]
+
+
+def reply(chatbot) -> str:
+    return chatbot.chat_history[-1].content
+
+
+def test_sessions_do_not_share_variables(inputs, session_id):
+    first, second = PythonChatbot(f"{session_id}-1"), PythonChatbot(f"{session_id}-2")
+    first.user_sent_message("secret = int(df['a'].sum())", inputs)
+    second.user_sent_message("print(secret)", inputs)
+    assert "'secret' is not defined" in reply(second)
+    first.user_sent_message("print(secret)", inputs)
+    assert "6\\n" in reply(first)
+
+
+def chart_code(values) -> str:
+    return f"import plotly.graph_objects as go\nplotly_figures.append(go.Figure(go.Bar(y={values!r})))"
+
+
+def test_conversation_continues_in_a_new_chatbot(inputs, session_id):
+    PythonChatbot(session_id).user_sent_message("total = int(df['a'].sum())", inputs)
+    resumed = PythonChatbot(session_id)
+    assert len(resumed.chat_history) == 4
+    assert resumed.chat_history[0].content == "total = int(df['a'].sum())"
+    resumed.user_sent_message("print(total * 2)", inputs)
+    assert "12\\n" in reply(resumed)
+    assert len(PythonChatbot(session_id).chat_history) == 8
+
+
+def test_input_data_is_replaced_each_turn(inputs, session_id, tmp_path):
+    other = tmp_path / "other.csv"
+    other.write_text("c\n1\n")
+    chatbot = PythonChatbot(session_id)
+    chatbot.user_sent_message("print(len(df))", inputs)
+    chatbot.user_sent_message("print(len(df))", inputs)
+    assert [d.variable_name for d in chatbot._state()["input_data"]] == ["df"]
+    chatbot.user_sent_message("print(len(other))", [InputData("other", str(other), "other data")])
+    assert [d.variable_name for d in chatbot._state()["input_data"]] == ["other"]
+
+
+def test_chart_paths_are_kept_per_message(inputs, session_id):
+    chatbot = PythonChatbot(session_id)
+    chatbot.user_sent_message(chart_code([1, 2]), inputs)
+    chatbot.user_sent_message("print(1)", inputs)
+    chatbot.user_sent_message(chart_code([3, 4]), inputs)
+    paths = PythonChatbot(session_id).output_image_paths
+    assert sorted(paths) == [3, 7, 11]
+    assert len(paths[3]) == 1 and paths[7] == [] and len(paths[11]) == 1
+    assert paths[3] != paths[11]
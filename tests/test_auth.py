@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from backend.core.security import user_cache
+from backend.main import app
+from backend.routers import auth
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def account():
+    username, password = f"user-{uuid.uuid4().hex[:8]}", "secret-password"
+    assert client.post("/api/auth/auth/signup", json={"username": username, "password": password}).status_code == 200
+    response = client.post("/api/auth/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return username, response.json()["token"]
+
+
+def test_wrong_password_is_rejected(account):
+    username, _ = account
+    response = client.post("/api/auth/auth/login", json={"username": username, "password": "wrong"})
+    assert response.status_code == 401
+
+
+def test_token_resolves_to_its_user(account):
+    username, token = account
+    assert auth.resolve_username(f"Bearer {token}") == username
+    assert asyncio.run(auth.resolve_username_async(f"Bearer {token}", username)) == username
+
+
+def test_invalid_or_mismatched_tokens_are_rejected(account):
+    _, token = account
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.resolve_username_async("Bearer not-a-token"))
+    assert error.value.status_code == 401
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.resolve_username_async(f"Bearer {token}", "someone-else"))
+    assert error.value.status_code == 403
+
+
+def test_cache_miss_is_loaded_off_the_event_loop(account, monkeypatch):
+    username, token = account
+    threads = []
+    load = auth.get_user_by_id
+
+    def recording_load(user_id):
+        threads.append(threading.current_thread())
+        return load(user_id)
+
+    monkeypatch.setattr(auth, "get_user_by_id", recording_load)
+    user_cache.invalidate(auth.verify_token(token)["uid"])
+
+    async def resolve():
+        return threading.current_thread(), await auth.resolve_username_async(f"Bearer {token}")
+
+    loop_thread, resolved = asyncio.run(resolve())
+    assert resolved == username
+    assert len(threads) == 1 and threads[0] is not loop_thread
+    # Now cached: no further lookups
+    asyncio.run(resolve())
+    assert len(threads) == 1
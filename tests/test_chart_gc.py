@@ -0,0 +1,110 @@
+import os
+import time
+
+import pytest
+
+from backend.core import chart_cleanup, chart_gc
+from backend.core.chart_cleanup import CHARTS_DIR, ChartRegistry, ensure_dirs
+from backend.core.chart_gc import ChartCollector
+
+HOUR = 3600
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(chart_cleanup, "time", clock)
+    monkeypatch.setattr(chart_gc, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A fresh registry and chart directory in place of the app's"""
+    monkeypatch.chdir(tmp_path)
+    registry = ChartRegistry(str(tmp_path / "charts.db"), flush_seconds=5)
+    monkeypatch.setattr(chart_cleanup, "chart_registry", registry)
+    monkeypatch.setattr(chart_gc, "chart_registry", registry)
+    ensure_dirs()
+    return registry
+
+
+def collector(batch_size=2):
+    return ChartCollector(interval_seconds=0, batch_size=batch_size, ttl_hours=1, reference_ttl_seconds=24 * HOUR)
+
+
+def create_chart(registry, clock, name):
+    with open(os.path.join(CHARTS_DIR, name), "w") as f:
+        f.write("<html></html>")
+    registry.record_creation(name)
+    clock.now += 1
+
+
+def chart_files():
+    return sorted(os.listdir(CHARTS_DIR))
+
+
+def test_each_sweep_removes_at_most_a_batch(registry, clock):
+    names = [f"chart{i}.html" for i in range(5)]
+    for name in names:
+        create_chart(registry, clock, name)
+    clock.now += 2 * HOUR
+    gc = collector(batch_size=2)
+    first = gc.sweep()
+    assert first["expired_removed"] == 2 and first["backlog"] and first["error"] is None
+    # Oldest first
+    assert chart_files() == names[2:]
+    assert gc.sweep()["expired_removed"] == 2
+    last = gc.sweep()
+    assert last["expired_removed"] == 1 and not last["backlog"]
+    assert chart_files() == [] and registry.stats()["charts"] == 0
+
+
+def test_referenced_charts_are_kept_until_their_references_expire(registry, clock):
+    create_chart(registry, clock, "shown.html")
+    create_chart(registry, clock, "unused.html")
+    registry.add_references(["shown.html"], "session", "message")
+    clock.now += 2 * HOUR
+    gc = collector()
+    assert gc.sweep()["expired_removed"] == 1
+    assert chart_files() == ["shown.html"]
+    clock.now += 24 * HOUR
+    sweep = gc.sweep()
+    assert sweep["references_pruned"] == 1 and sweep["expired_removed"] == 1
+    assert chart_files() == []
+
+
+def test_orphan_scan_resumes_where_the_last_sweep_stopped(registry, clock):
+    create_chart(registry, clock, "known.html")
+    for name in ("a.html", "b.html", "c.html"):
+        with open(os.path.join(CHARTS_DIR, name), "w") as f:
+            f.write("orphan")
+    clock.now += 60 * 10
+    gc = collector(batch_size=2)
+    scanned = [gc.sweep()["entries_scanned"] for _ in range(3)]
+    # Four entries: two per sweep, then a new pass finds only the known chart
+    assert scanned == [2, 2, 1]
+    assert chart_files() == ["known.html"]
+    assert gc.total_orphaned == 3
+
+
+def test_stats_accumulate_across_sweeps(registry, clock):
+    for name in ("a.html", "b.html", "c.html"):
+        create_chart(registry, clock, name)
+    clock.now += 2 * HOUR
+    gc = collector(batch_size=2)
+    gc.sweep()
+    gc.sweep()
+    stats = gc.stats()
+    assert not stats["running"]
+    assert stats["sweeps"] == 2 and stats["total_expired_removed"] == 3 and stats["total_orphans_removed"] == 0
+    assert stats["last_sweep"]["started_at"] == clock.now
+    assert stats["last_sweep"]["expired_removed"] == 1
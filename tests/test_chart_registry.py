@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+
+import pytest
+
+from backend.core import chart_cleanup
+from backend.core.chart_cleanup import LEGACY_METADATA_FILE, ChartRegistry
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(chart_cleanup, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_registry(tmp_path, monkeypatch):
+    """Registries over a fresh database, run from a directory with no chart files"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(LEGACY_METADATA_FILE))
+
+    def make():
+        registry = ChartRegistry(str(tmp_path / "charts.db"), flush_seconds=5)
+        registry.stats()  # Tables are set up, and legacy metadata imported, on first use
+        return registry
+
+    return make
+
+
+def last_accessed(registry, filename):
+    with registry._pool.connection() as conn:
+        return conn.execute("SELECT last_accessed FROM charts WHERE filename = ?", (filename,)).fetchone()[0]
+
+
+def write_legacy(content: str):
+    with open(LEGACY_METADATA_FILE, "w") as f:
+        f.write(content)
+
+
+def test_legacy_metadata_is_imported_once(make_registry):
+    write_legacy(json.dumps({
+        "old.html": {"created_at": "2024-01-01T00:00:00", "last_accessed": "2024-01-02T00:00:00"},
+        "broken.html": {"created_at": "yesterday"},
+    }))
+    registry = make_registry()
+    assert not os.path.exists(LEGACY_METADATA_FILE)
+    assert registry.known(["old.html", "broken.html", "new.html"]) == {"old.html", "broken.html"}
+    assert last_accessed(registry, "broken.html") == 0.0
+    assert registry.expired(cutoff=1.0) == ["broken.html"]
+
+
+@pytest.mark.parametrize("content", ["", "{not json", "[1, 2]"])
+def test_unreadable_legacy_metadata_is_set_aside(make_registry, caplog, content):
+    write_legacy(content)
+    with caplog.at_level(logging.WARNING, logger=chart_cleanup.__name__):
+        registry = make_registry()
+        make_registry()
+    assert not os.path.exists(LEGACY_METADATA_FILE)
+    assert registry.stats()["charts"] == 0
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    # An empty file simply has nothing to import
+    assert len(warnings) == (0 if not content else 1)
+    assert os.path.exists(f"{LEGACY_METADATA_FILE}.invalid") == bool(content)
+
+
+def test_accesses_are_buffered_until_flushed(make_registry, clock):
+    registry = make_registry()
+    registry.record_creation("a.html")
+    clock.now += 60
+    registry.record_access("a.html")
+    assert last_accessed(registry, "a.html") == clock.now - 60
+    registry.flush()
+    assert last_accessed(registry, "a.html") == clock.now
+    # A late flush never moves last_accessed back
+    clock.now -= 30
+    registry.record_access("a.html")
+    registry.flush()
+    assert last_accessed(registry, "a.html") == clock.now + 30
+
+
+def test_expired_returns_unreferenced_charts_oldest_first(make_registry, clock):
+    registry = make_registry()
+    for filename in ("newest.html", "older.html", "oldest.html", "shown.html"):
+        registry.record_creation(filename)
+        clock.now -= 100
+    registry.add_references(["shown.html"], "session", "message")
+    cutoff = clock.now + 350
+    assert registry.expired(cutoff) == ["oldest.html", "older.html"]
+    assert registry.expired(cutoff, limit=1) == ["oldest.html"]
+    # A buffered access counts even before the background flush
+    clock.now = cutoff + 1000
+    registry.record_access("oldest.html")
+    assert registry.expired(cutoff) == ["older.html"]
+    assert registry.release_session("session") == 1
+    assert registry.expired(cutoff) == ["shown.html", "older.html"]
@@ -0,0 +1,67 @@
+import gzip
+import os
+
+import plotly.graph_objects as go
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.core.chart_cleanup import CHARTS_DIR
+from backend.core.charts import save_figures
+from backend.core.precompress import precompress
+from backend.main import app
+from backend.routers.charts import IMMUTABLE_CACHE_CONTROL
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def chart():
+    # Large enough to be worth a compressed copy
+    figure = go.Figure(go.Scatter(x=list(range(500)), y=[i % 7 for i in range(500)], text=["point"] * 500))
+    return save_figures([figure])[0]
+
+
+def test_content_addressed_chart_is_immutable(chart):
+    response = client.get(f"/api/charts/{chart}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] == f'"{chart[:-5]}"'
+
+
+def test_matching_etag_gets_304(chart):
+    etag = client.get(f"/api/charts/{chart}").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(f"/api/charts/{chart}", headers={"If-None-Match": header})
+        assert response.status_code == 304 and response.content == b""
+    assert client.get(f"/api/charts/{chart}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_precompressed_variant_is_served_with_its_own_etag(chart):
+    path = os.path.join(CHARTS_DIR, chart)
+    precompress(path)
+    plain = client.get(f"/api/charts/{chart}", headers={"Accept-Encoding": "identity"})
+    compressed = client.get(f"/api/charts/{chart}", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.content == plain.content  # decoded by the client
+    with open(f"{path}.gz", "rb") as f:
+        assert gzip.decompress(f.read()) == plain.content
+
+
+def test_spec_route_and_bad_names(chart):
+    spec_name = chart.replace(".html", ".json")
+    assert client.get(f"/api/charts/specs/{spec_name}").json()["data"][0]["type"] == "scatter"
+    assert client.get("/api/charts/not-a-chart.html").status_code == 404
+    assert client.get(f"/api/charts/{'0' * 32}.html").status_code == 404
+    assert client.get("/api/charts/assets/plotly-0.0.0.min.js").status_code == 404
+
+
+def test_old_image_urls_redirect_to_the_charts_route(chart):
+    response = client.get(f"/images/plotly_figures/html/{chart}", follow_redirects=False)
+    assert response.status_code == 301
+    assert response.headers["location"] == f"/api/charts/{chart}"
+    spec_name = chart.replace(".html", ".json")
+    response = client.get(f"/images/plotly_figures/specs/{spec_name}", follow_redirects=False)
+    assert response.headers["location"] == f"/api/charts/specs/{spec_name}"
+    assert client.get(f"/images/plotly_figures/html/{chart}").headers["etag"].startswith(f'"{chart[:-5]}')
+    assert client.get("/images/plotly_figures/metadata.json", follow_redirects=False).status_code == 404
@@ -0,0 +1,67 @@
+import base64
+import json
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+from backend.core.chart_cleanup import CHARTS_DIR
+from backend.core.charts import figure_spec_json, load_chart_spec, save_figures
+
+_DTYPES = {"f8": "float64", "f4": "float32", "i4": "int32", "u4": "uint32",
+           "i2": "int16", "u2": "uint16", "i1": "int8", "u1": "uint8"}
+
+
+def decode(value):
+    """What plotly.js reads for an attribute value: typed-array specs are decoded only at the top"""
+    if isinstance(value, dict) and "bdata" in value:
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=_DTYPES[value["dtype"]])
+        if "shape" in value:
+            array = array.reshape([int(n) for n in value["shape"].split(",")])
+        return array.tolist()
+    return value
+
+
+def trace_of(trace):
+    return json.loads(figure_spec_json(go.Figure(trace)))["data"][0]
+
+
+def test_long_numeric_arrays_are_encoded():
+    trace = trace_of(go.Scatter(x=np.arange(20), y=np.linspace(0, 1, 20)))
+    assert "bdata" in trace["x"] and "bdata" in trace["y"]
+    assert decode(trace["x"]) == list(range(20))
+    assert decode(trace["y"]) == np.linspace(0, 1, 20).tolist()
+
+
+def test_short_arrays_stay_plain_lists():
+    trace = trace_of(go.Bar(x=["a", "b"], y=[1, 2]))
+    assert trace["x"] == ["a", "b"] and trace["y"] == [1, 2]
+
+
+def test_heatmap_z_as_list_of_lists_round_trips():
+    z = [[float(i * 10 + j) for j in range(10)] for i in range(10)]
+    trace = trace_of(go.Heatmap(z=z))
+    # Specs inside a plain array are never decoded by plotly.js
+    assert decode(trace["z"]) == z
+
+
+def test_heatmap_z_as_2d_array_round_trips():
+    z = np.arange(30, dtype=np.float64).reshape(5, 6)
+    trace = trace_of(go.Heatmap(z=z))
+    assert "shape" in trace["z"]
+    assert decode(trace["z"]) == z.tolist()
+
+
+def test_table_cell_values_are_left_alone():
+    columns = [list(range(10)), [float(i) / 2 for i in range(10)]]
+    trace = trace_of(go.Table(cells=dict(values=columns)))
+    assert decode(trace["cells"]["values"]) == columns
+
+
+def test_save_figures_is_content_addressed():
+    figure = go.Figure(go.Scatter(x=list(range(10)), y=list(range(10))))
+    first = save_figures([figure])
+    second = save_figures([go.Figure(figure)])
+    assert first == second
+    assert os.path.exists(os.path.join(CHARTS_DIR, first[0]))
+    assert load_chart_spec(first[0])["data"][0]["type"] == "scatter"
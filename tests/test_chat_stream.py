@@ -0,0 +1,102 @@
+import io
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.routers import chat
+from backend.main import app
+
+client = TestClient(app)
+CODE_REPLY = "Sum the sales.\n```python\nprint(df['sales'].sum())\n```"
+
+
+def chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeAsyncClient:
+    """Streams each scripted reply in two halves; a reply that is an exception is raised"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream=False, stream_options=None):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))], usage=None)
+
+        async def chunks():
+            middle = len(reply) // 2
+            yield chunk(reply[:middle])
+            yield chunk(reply[middle:])
+            yield chunk(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15))
+
+        return chunks()
+
+
+@pytest.fixture
+def username(offline_tiktoken):
+    name = f"streamer-{uuid.uuid4().hex[:8]}"
+    content = f"region,sales\nnorth,1.5\nsouth,2.5\n# {name}\n"
+    response = client.post("/api/upload/", data={"username": name},
+                           files={"file": ("sales.csv", io.BytesIO(content.encode()), "text/csv")})
+    assert response.status_code == 200
+    return name
+
+
+def stream(monkeypatch, username, *replies):
+    fake = FakeAsyncClient(*replies)
+    monkeypatch.setattr(chat, "get_async_client", lambda: fake)
+    response = client.post("/api/chat/stream", json={"username": username, "question": "Total sales?", "no_cache": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for raw in response.text.strip().split("\n\n"):
+        event, data = raw.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_stages_stream_in_order_and_end_with_done(monkeypatch, username):
+    events = stream(monkeypatch, username, CODE_REPLY, "Sales total 4.0.")
+    names = [name for name, _ in events]
+    assert names == ["status", "code_token", "code_token", "code", "status", "execution",
+                     "status", "token", "token", "done"]
+    assert [data["stage"] for name, data in events if name == "status"] == [
+        "generating_code", "executing", "writing_answer"]
+    assert "".join(data["text"] for name, data in events if name == "code_token") == CODE_REPLY
+    assert events[3][1] == {"code": "print(df['sales'].sum())"}
+    assert events[5][1]["output"] == "4.0"
+    done = events[-1][1]
+    assert done["answer"] == "Sales total 4.0."
+    assert done["technical_details"] == "4.0" and done["charts"] == []
+
+
+def test_model_failure_is_reported_as_an_error_event(monkeypatch, username):
+    events = stream(monkeypatch, username, RuntimeError("model unavailable"))
+    assert events == [("status", {"stage": "generating_code"}),
+                      ("error", {"message": "OpenAI API Error: model unavailable"})]
+
+
+def test_reply_without_code_ends_with_suggestions(monkeypatch, username):
+    events = stream(monkeypatch, username, "I am not sure what you mean.", "Try asking about sales by region.")
+    name, data = events[-1]
+    assert name == "error"
+    assert data["suggestions"] == "Try asking about sales by region."
+    assert "done" not in [name for name, _ in events]
+
+
+def test_non_streaming_endpoint_returns_the_same_answer(monkeypatch, username):
+    fake = FakeAsyncClient(CODE_REPLY, "Sales total 4.0.")
+    monkeypatch.setattr(chat, "get_async_client", lambda: fake)
+    response = client.post("/api/chat/", json={"username": username, "question": "Total sales?", "no_cache": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"] == "Sales total 4.0." and body["technical_details"] == "4.0" and body["charts"] == []
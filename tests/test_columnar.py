@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+
+from backend.core.columnar import (
+    ColumnarWriter, columnar_path, has_columnar_copy, load_dataset, read_columns, write_columnar_copy,
+)
+
+
+def write_csv(path, df):
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_columnar_copy_round_trips(tmp_path):
+    df = pd.DataFrame({"region": ["north", "south", None], "sales": [1.5, None, 3.0], "units": [1, 2, 3]})
+    csv_path = write_csv(tmp_path / "data.csv", df)
+    assert write_columnar_copy(pd.read_csv(csv_path), csv_path) == columnar_path(csv_path)
+    assert has_columnar_copy(csv_path)
+    pd.testing.assert_frame_equal(load_dataset(csv_path), pd.read_csv(csv_path))
+    pd.testing.assert_frame_equal(load_dataset(csv_path, columns=["units"]), df[["units"]])
+    assert read_columns(csv_path) == ["region", "sales", "units"]
+
+
+def test_stale_copy_falls_back_to_the_csv(tmp_path):
+    csv_path = write_csv(tmp_path / "data.csv", pd.DataFrame({"a": [1, 2]}))
+    write_columnar_copy(pd.read_csv(csv_path), csv_path)
+    write_csv(csv_path, pd.DataFrame({"a": [1, 2, 3]}))
+    arrow_mtime = columnar_path(csv_path).stat().st_mtime_ns
+    os.utime(csv_path, ns=(arrow_mtime + 10 ** 9, arrow_mtime + 10 ** 9))
+    assert not has_columnar_copy(csv_path)
+    assert load_dataset(csv_path)["a"].tolist() == [1, 2, 3]
+
+
+def test_unreadable_copy_falls_back_to_the_csv(tmp_path):
+    csv_path = write_csv(tmp_path / "data.csv", pd.DataFrame({"a": [1, 2]}))
+    columnar_path(csv_path).write_bytes(b"not arrow")
+    assert load_dataset(csv_path)["a"].tolist() == [1, 2]
+
+
+def test_writer_appends_chunks(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    writer = ColumnarWriter(csv_path)
+    writer.write(pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}))
+    writer.write(pd.DataFrame({"a": [3], "b": ["z"]}))
+    assert writer.close() == columnar_path(csv_path)
+    df = pd.read_feather(columnar_path(csv_path))
+    assert df["a"].tolist() == [1, 2, 3] and df["b"].tolist() == ["x", "y", "z"]
+
+
+def test_writer_abandons_copy_on_incompatible_chunk(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    writer = ColumnarWriter(csv_path)
+    writer.write(pd.DataFrame({"a": [1, 2]}))
+    writer.write(pd.DataFrame({"a": ["not", "numbers"]}))
+    assert writer.close() is None
+    assert not columnar_path(csv_path).exists()
+    assert os.listdir(tmp_path) == []
+
+
+def test_concurrent_writers_use_their_own_temp_files(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    first, second = ColumnarWriter(csv_path), ColumnarWriter(csv_path)
+    assert first.tmp_path != second.tmp_path
+    first.write(pd.DataFrame({"a": [1]}))
+    second.write(pd.DataFrame({"a": [2]}))
+    assert first.close() == second.close() == columnar_path(csv_path)
+    assert os.listdir(tmp_path) == [columnar_path(csv_path).name]
+
+
+def test_copy_keeps_parsed_types(tmp_path):
+    csv_path = write_csv(tmp_path / "data.csv", pd.DataFrame({"day": ["2024-01-01", "2024-01-02"], "n": [1, 2]}))
+    df = pd.read_csv(csv_path, parse_dates=["day"])
+    write_columnar_copy(df, csv_path)
+    loaded = load_dataset(csv_path)
+    assert pd.api.types.is_datetime64_any_dtype(loaded["day"])
+    pd.testing.assert_frame_equal(loaded, df)
@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+
+from backend.core.dataframe_cache import DataFrameCache, file_sha256
+
+
+def write(path, rows):
+    pd.DataFrame({"a": range(rows)}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_repeated_loads_are_cached(tmp_path):
+    cache = DataFrameCache(max_bytes=10 ** 8)
+    path = write(tmp_path / "a.csv", 10)
+    assert cache.get(path) is cache.get(path)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_changed_file_replaces_the_cached_version(tmp_path):
+    cache = DataFrameCache(max_bytes=10 ** 8)
+    path = write(tmp_path / "a.csv", 10)
+    cache.get(path)
+    write(path, 20)
+    os.utime(path, ns=(0, 1))
+    assert len(cache.get(path)) == 20
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_frames_are_evicted(tmp_path):
+    paths = [write(tmp_path / f"{name}.csv", 1000) for name in "abc"]
+    size = int(pd.read_csv(paths[0]).memory_usage(deep=True).sum())
+    cache = DataFrameCache(max_bytes=2 * size)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+    assert cache.stats()["evictions"] == 1
+    cache.get(paths[0])
+    assert cache.stats()["hits"] == 2
+
+
+def test_file_sha256(tmp_path):
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"abc")
+    assert file_sha256(path, block_size=1) == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from backend.core.db import MIGRATIONS, ConnectionPool, migrate
+
+
+def user_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_fresh_database_is_migrated_to_latest(tmp_path):
+    conn = sqlite3.connect(tmp_path / "users.db")
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+    assert "content_hash" in columns
+    # Running again is a no-op
+    assert migrate(conn) == MIGRATIONS[-1][0]
+
+
+def test_existing_rows_survive_later_migrations(tmp_path):
+    conn = sqlite3.connect(tmp_path / "users.db")
+    migrate(conn, MIGRATIONS[:1])
+    conn.execute("INSERT INTO files (username, filename, filepath) VALUES ('u', 'a.csv', 'uploads/a.csv')")
+    conn.commit()
+    migrate(conn)
+    assert conn.execute("SELECT username, filename, content_hash FROM files").fetchall() == [("u", "a.csv", None)]
+
+
+def test_failed_migration_is_rolled_back(tmp_path):
+    conn = sqlite3.connect(tmp_path / "users.db")
+    broken = MIGRATIONS + [(MIGRATIONS[-1][0] + 1, "broken", [
+        "CREATE TABLE half_done (id INTEGER)",
+        "NOT VALID SQL",
+    ])]
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, broken)
+    assert user_version(conn) == MIGRATIONS[-1][0]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def test_pool_reuses_connections_and_rolls_back_errors(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2, setup=migrate)
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is first
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO users (username, password_hash) VALUES ('u', 'h')")
+            raise RuntimeError
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    pool.close()
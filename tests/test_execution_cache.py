@@ -0,0 +1,65 @@
+import time
+
+from backend.core.chart_cleanup import chart_registry
+from backend.core.execution_cache import ExecutionCache, execution_cache, normalize_code
+from backend.graph.tools import execute_python
+
+
+def run(code, csv_path, session_id):
+    output, _ = execute_python(code, "test", [("df", csv_path)], {}, session_id)
+    return output
+
+
+def test_normalize_code_ignores_comments_and_formatting():
+    assert normalize_code("x = 1  # one\nprint( x )") == normalize_code("x=1\nprint(x)")
+    assert normalize_code("x = 1") != normalize_code("x = 2")
+    assert normalize_code("x = (") is None
+
+
+def test_repeated_code_on_unchanged_data_is_served_from_cache(csv_path, session_id):
+    hits = execution_cache.hits
+    assert run("print(df['a'].sum())", csv_path, session_id) == "6\n"
+    assert run("print(df['a'].sum())", csv_path, session_id) == "6\n"
+    assert execution_cache.hits == hits + 1
+
+
+def test_session_variable_changed_in_place_is_not_replayed(csv_path, session_id):
+    code = "t['a'] = t['a'] * 2\nprint(t['a'].tolist())"
+    run("t = df.copy()", csv_path, session_id)
+    assert run(code, csv_path, session_id) == "[2, 4, 6]\n"
+    assert run(code, csv_path, session_id) == "[4, 8, 12]\n"
+    assert run("print(t['a'].tolist())", csv_path, session_id) == "[4, 8, 12]\n"
+
+
+def test_cached_variables_are_snapshots(csv_path, session_id):
+    code = "t['a'] = t['a'] * 2\nprint(t['a'].tolist())"
+    run("t = df.copy()", csv_path, session_id)
+    run(code, csv_path, session_id)
+    run(code, csv_path, session_id)
+    # Starting over replays the first doubling, with the variable as it was then
+    run("t = df.copy()", csv_path, session_id)
+    assert run(code, csv_path, session_id) == "[2, 4, 6]\n"
+    assert run("print(t['a'].tolist())", csv_path, session_id) == "[2, 4, 6]\n"
+
+
+def test_cache_evicts_least_recently_used_entries():
+    cache = ExecutionCache(max_bytes=25)
+    cache.put("first", "x" * 10, [], {})
+    cache.put("second", "y" * 10, [], {})
+    assert cache.get("first") is not None
+    cache.put("third", "z" * 10, [], {})
+    assert cache.get("second") is None
+    assert cache.get("first") is not None and cache.get("third") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_hit_marks_its_charts_as_used(csv_path, session_id):
+    code = "import plotly.graph_objects as go\nplotly_figures.append(go.Figure(go.Bar(y=df['a'].tolist())))"
+    _, state = execute_python(code, "test", [("df", csv_path)], {}, session_id)
+    charts = state["output_image_paths"]
+    with chart_registry._pool.connection() as conn:
+        conn.executemany("UPDATE charts SET last_accessed = 0 WHERE filename = ?", [(c,) for c in charts])
+    hits = execution_cache.hits
+    _, state = execute_python(code, "test", [("df", csv_path)], {}, session_id)
+    assert execution_cache.hits == hits + 1 and state["output_image_paths"] == charts
+    assert not set(charts) & set(chart_registry.expired(time.time() - 60))
@@ -0,0 +1,51 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend.core.history import HistoryManager, split_turns
+
+
+def turn(index: int, output_chars: int = 2000):
+    call_id = f"call-{index}"
+    code = "\n".join(f"line_{n} = {n}" for n in range(20))
+    return [
+        HumanMessage(content=f"Question {index}"),
+        AIMessage(content="", tool_calls=[{"name": "complete_python_task", "id": call_id,
+                                           "args": {"thought": "t", "python_code": code}}]),
+        ToolMessage(content="x" * output_chars, tool_call_id=call_id),
+        AIMessage(content=f"Answer {index}"),
+    ]
+
+
+def conversation(turns: int):
+    return [message for index in range(turns) for message in turn(index)]
+
+
+def assert_tool_calls_answered(messages):
+    call_ids = {call["id"] for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    assert call_ids == answered
+
+
+def test_compact_works_without_tiktoken(offline_tiktoken):
+    manager = HistoryManager(token_budget=100_000, recent_turns=2, summary_chars=100)
+    history = manager.compact(conversation(4))
+    turns = split_turns(history)
+    assert len(turns) == 4
+    # Older tool output and code are shortened, the recent turns are verbatim
+    assert len(turns[0][2].content) < 200
+    assert "more lines omitted" in turns[0][1].tool_calls[0]["args"]["python_code"]
+    assert turns[-1] == turn(3)
+    assert_tool_calls_answered(history)
+
+
+def test_oldest_turns_are_dropped_over_budget(offline_tiktoken):
+    manager = HistoryManager(token_budget=1500, recent_turns=2, summary_chars=100)
+    history = manager.compact(conversation(6))
+    assert history[0].content.endswith("earlier exchanges omitted to save context]")
+    assert history[-4:] == turn(5)
+    assert_tool_calls_answered(history)
+
+
+def test_recent_turns_are_kept_even_over_budget(offline_tiktoken):
+    manager = HistoryManager(token_budget=10, recent_turns=2, summary_chars=100)
+    history = manager.compact(conversation(3))
+    assert history[-8:] == turn(1) + turn(2)
@@ -0,0 +1,36 @@
+from backend.core.llm_cache import LLMResponseCache, make_cache_key, normalize_question
+
+
+def test_equivalent_questions_share_a_key():
+    assert normalize_question("  What are   TOTAL sales?? ") == "what are total sales"
+    key = make_cache_key("gpt-4", "v1", "hash", "What are total sales?")
+    assert key == make_cache_key("gpt-4", "v1", "hash", "what are total sales")
+    assert key != make_cache_key("gpt-4", "v1", "other-hash", "what are total sales")
+    assert key != make_cache_key("gpt-4", "v2", "hash", "what are total sales")
+
+
+def test_get_and_put(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), ttl_seconds=3600, max_bytes=10_000)
+    assert cache.get("k") is None
+    cache.put("k", "code", "print(1)")
+    assert cache.get("k") == "print(1)"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), ttl_seconds=-1, max_bytes=10_000)
+    cache.put("k", "code", "print(1)")
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), ttl_seconds=3600, max_bytes=25)
+    cache.put("a", "code", "x" * 10)
+    cache.put("b", "code", "y" * 10)
+    cache.get("a")
+    cache.put("c", "code", "z" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "z" * 10
+    # Values larger than the whole budget are not stored
+    cache.put("d", "code", "w" * 100)
+    assert cache.get("d") is None
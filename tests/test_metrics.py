@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+
+from backend.core.metrics import MetricsRegistry, collect_timings, server_timing_header, timed
+from backend.main import app
+
+client = TestClient(app)
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage="a")
+    text = registry.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="a"} 3' in text
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test", ["path"]).inc(path='a"b\\c')
+    assert 'test_total{path="a\\"b\\\\c"} 1' in registry.render()
+
+
+def test_timings_are_collected_per_block():
+    with timed("outside"):
+        pass
+    with collect_timings() as timings:
+        with timed("load"):
+            pass
+        with timed("load"):
+            pass
+    assert [stage for stage, _ in timings] == ["load", "load"]
+    header = server_timing_header([("load", 0.001), ("load", 0.002), ("exec", 0.0005)], 0.01)
+    assert header == "load;dur=3.0, exec;dur=0.5, total;dur=10.0"
+
+
+def test_responses_carry_server_timing_and_metrics_are_served():
+    response = client.get("/health")
+    assert response.headers["server-timing"].startswith("total;dur=")
+    text = client.get("/metrics").text
+    assert 'insights_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in text
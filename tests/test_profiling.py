@@ -0,0 +1,57 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.core.db import connection
+from backend.core.profiling import (
+    SKETCH_SIZE, DatasetProfiler, load_profile, load_profile_for_path, profile_dataframe, render_profile, save_profile,
+)
+
+
+def profile_in_chunks(df: pd.DataFrame, chunk_rows: int) -> dict:
+    profiler = DatasetProfiler()
+    for start in range(0, len(df), chunk_rows):
+        profiler.update(df.iloc[start:start + chunk_rows])
+    return profiler.finalize()
+
+
+@pytest.mark.parametrize("distinct", [50_000, 200_000])
+def test_distinct_estimate_is_close_to_the_real_count(distinct):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "id": rng.integers(0, distinct * 10, size=distinct * 2),
+        "label": [f"user-{i}" for i in rng.integers(0, distinct, size=distinct * 2)],
+    })
+    profile = profile_in_chunks(df, 25_000)
+    for col in ("id", "label"):
+        real = df[col].nunique()
+        assert abs(profile["columns"][col]["distinct_estimate"] - real) / real < 0.1
+
+
+def test_small_columns_are_counted_exactly():
+    df = pd.DataFrame({"region": ["north", "south", None, "north"] * 50, "sales": np.arange(200.0)})
+    profile = profile_in_chunks(df, 30)
+    assert profile["row_count"] == 200
+    region = profile["columns"]["region"]
+    assert region["distinct_estimate"] == 2 and region["null_count"] == 50
+    assert region["top_values"][0] == {"value": "north", "count": 100}
+    sales = profile["columns"]["sales"]
+    assert sales["distinct_estimate"] == 200 < SKETCH_SIZE
+    assert (sales["min"], sales["max"]) == (0.0, 199.0)
+    assert sum(sales["histogram"]["counts"]) == 200
+
+
+def test_profile_is_saved_and_loaded(csv_path):
+    profile = profile_dataframe(pd.read_csv(csv_path))
+    with connection() as conn:
+        file_id = conn.execute(
+            "INSERT INTO files (username, filename, filepath, content_hash) VALUES (?, ?, ?, ?)",
+            (f"profiler-{uuid.uuid4().hex[:8]}", "data.csv", csv_path, uuid.uuid4().hex)
+        ).lastrowid
+    assert load_profile(file_id) is None
+    save_profile(file_id, profile)
+    assert load_profile(file_id) == profile
+    assert load_profile_for_path(csv_path) == profile
+    assert "- a (int64; nulls=0; min=1; max=3; ~distinct=3" in render_profile(profile)
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from backend.core.profiling import profile_dataframe
+from backend.core.prompts import CHARS_PER_TOKEN, count_tokens, load_encoding, truncate_to_tokens
+from backend.routers.chat import build_code_messages
+
+
+def test_token_counts_fall_back_to_estimate_offline(offline_tiktoken):
+    load_encoding("gpt-4")
+    assert count_tokens("x" * 40, "gpt-4") == 40 // CHARS_PER_TOKEN
+    assert count_tokens("", "gpt-4") == 0
+
+
+def test_truncation_offline(offline_tiktoken):
+    text = truncate_to_tokens("word " * 1000, 50, "gpt-4")
+    assert text.endswith("[truncated]")
+    assert count_tokens(text, "gpt-4") <= 50
+
+
+def test_code_prompt_is_built_offline(offline_tiktoken):
+    profile = profile_dataframe(pd.DataFrame({"region": ["north", "south"], "sales": [1.5, 2.5]}))
+    messages, report = build_code_messages("You write pandas code.", profile, "Total sales by region?")
+    assert messages[0] == {"role": "system", "content": "You write pandas code."}
+    assert "Total sales by region?" in messages[1]["content"]
+    assert "sales" in messages[1]["content"]
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from backend.core.sandbox import SandboxError, SandboxPool
+
+
+def job(code, session_id="s"):
+    return {"python_code": code, "thought": "test", "inputs": [], "variables": {}, "session_id": session_id}
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, timeout=5, memory_limit_mb=0, max_jobs=3)
+    yield pool
+    pool.shutdown()
+
+
+def test_session_variables_persist_on_the_worker(pool):
+    pool.run("s", job("x = 41"))
+    output, _ = pool.run("s", job("print(x + 1)"))
+    assert output == "42\n"
+
+
+def test_errors_in_code_are_returned_as_output(pool):
+    output, state = pool.run("s", job("1 / 0"))
+    assert "division by zero" in output
+    assert state["intermediate_outputs"][0]["output"] == output
+
+
+def test_timed_out_worker_is_replaced(pool):
+    pool.timeout = 1
+    with pytest.raises(SandboxError, match="timed out"):
+        pool.run("s", job("import time\ntime.sleep(30)"))
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["recycled"] == 1 and stats["workers"] == 1
+    assert pool.run("s", job("print('ok')"))[0] == "ok\n"
+
+
+def test_worker_is_recycled_after_max_jobs(pool):
+    for code in ("x = 1", "pass", "pass"):
+        pool.run("s", job(code))
+    assert pool.stats()["recycled"] == 1
+    # The session starts over on the fresh worker
+    assert "'x' is not defined" in pool.run("s", job("print(x)"))[0]
+
+
+def test_replacement_is_spawned_without_holding_the_pool_lock(pool, monkeypatch):
+    pool.start()
+    spawn = pool._spawn
+    lock_free_during_spawn = []
+
+    def spawn_and_probe():
+        # Another thread (another session's run) must be able to take the lock meanwhile
+        def probe():
+            acquired = pool._cond.acquire(timeout=1)
+            lock_free_during_spawn.append(acquired)
+            if acquired:
+                pool._cond.release()
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        return spawn()
+
+    monkeypatch.setattr(pool, "_spawn", spawn_and_probe)
+    pool.timeout = 1
+    with pytest.raises(SandboxError):
+        pool.run("s", job("import time\ntime.sleep(30)"))
+    assert lock_free_during_spawn == [True]
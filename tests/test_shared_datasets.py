@@ -0,0 +1,79 @@
+import os
+import threading
+
+import pandas as pd
+
+from backend.core import shared_datasets as module
+from backend.core.columnar import columnar_path, write_columnar_copy
+from backend.core.shared_datasets import SharedDatasetRegistry, attach
+
+
+def write_other(csv_path):
+    other = os.path.join(os.path.dirname(csv_path), "other.csv")
+    pd.DataFrame({"c": [1.0, 2.0]}).to_csv(other, index=False)
+    return other
+
+
+def test_attached_frame_equals_the_dataset(csv_path, session_id):
+    registry = SharedDatasetRegistry(3600)
+    handle = registry.publish(csv_path, session_id)
+    assert registry.stats()["owned_segments"] == 1
+    pd.testing.assert_frame_equal(attach(handle), pd.read_csv(csv_path))
+    registry.release_all()
+
+
+def test_columnar_copy_is_shared_as_is(csv_path, session_id):
+    write_columnar_copy(pd.read_csv(csv_path), csv_path)
+    registry = SharedDatasetRegistry(3600)
+    handle = registry.publish(csv_path, session_id)
+    assert handle["path"] == str(columnar_path(csv_path))
+    pd.testing.assert_frame_equal(attach(handle), pd.read_csv(csv_path))
+    registry.release_all()
+    assert columnar_path(csv_path).exists()
+
+
+def test_repeated_publish_reuses_the_segment(csv_path, monkeypatch):
+    registry = SharedDatasetRegistry(3600)
+    created = []
+    create = registry._create_segment
+
+    def slow_create(*args):
+        created.append(1)
+        threading.Event().wait(0.05)
+        return create(*args)
+
+    monkeypatch.setattr(registry, "_create_segment", slow_create)
+    handles = []
+    threads = [threading.Thread(target=lambda i=i: handles.append(registry.publish(csv_path, f"s{i}")))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    handles.append(registry.publish(csv_path, "s4"))
+    assert len(created) == 1
+    assert len({h["path"] for h in handles}) == 1
+    assert registry.stats() == {"segments": 1, "owned_segments": 1, "sessions": 5}
+    registry.release_all()
+
+
+def test_segment_is_unlinked_once_no_session_uses_it(csv_path):
+    registry = SharedDatasetRegistry(3600)
+    path = registry.publish(csv_path, "first")["path"]
+    registry.publish(csv_path, "second")
+    registry.release_session("first")
+    assert os.path.exists(path)
+    registry.release_session("second")
+    assert not os.path.exists(path)
+    assert registry.stats() == {"segments": 0, "owned_segments": 0, "sessions": 0}
+
+
+def test_idle_sessions_are_released(csv_path, monkeypatch):
+    registry = SharedDatasetRegistry(60)
+    clock = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: clock[0])
+    path = registry.publish(csv_path, "idle")["path"]
+    clock[0] += 61
+    registry.publish(write_other(csv_path), "active")
+    assert not os.path.exists(path)
+    registry.release_all()
@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend.core.startup_profile import parse_importtime
+from backend.graph.tools import analysis_namespace, warm_up
+from backend.main import app
+
+REPO = Path(__file__).resolve().parents[1]
+# Each takes from a few hundred milliseconds to seconds to import
+HEAVY_MODULES = ["plotly.express", "plotly.graph_objects", "sklearn", "langgraph", "openai"]
+
+
+def test_heavy_libraries_are_not_imported_with_the_app():
+    code = f"import json, sys, backend.main; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.getcwd(),
+                          env={**os.environ, "PYTHONPATH": str(REPO)})
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.splitlines()[-1]) == []
+
+
+def test_warm_up_loads_the_analysis_namespace():
+    warm_up()
+    namespace = analysis_namespace()
+    assert {"px", "go", "pio", "sklearn"} <= set(namespace)
+    assert namespace["go"].Figure is not None
+    assert analysis_namespace() is namespace
+
+
+def test_startup_phases_are_reported():
+    phases = TestClient(app).get("/health/startup").json()["phases"]
+    assert all(seconds >= 0 for seconds in phases.values())
+
+
+def test_importtime_output_is_parsed():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   encodings.utf_8\n"
+        "import time:      2000 |       5000 | backend.main\n"
+    )
+    assert parse_importtime(stderr) == [
+        {"module": "encodings.utf_8", "depth": 1, "self_us": 120, "cumulative_us": 120},
+        {"module": "backend.main", "depth": 0, "self_us": 2000, "cumulative_us": 5000},
+    ]
@@ -0,0 +1,107 @@
+import io
+import os
+import subprocess
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.core.blob_store import LOCK_STRIPES, BlobStore
+from backend.main import app
+
+client = TestClient(app)
+CSV = "region,sales\nnorth,1.5\nsouth,2.5\neast,\n"
+
+
+def upload(content: str, username: str = "uploader", filename: str = "sales.csv"):
+    return client.post("/api/upload/", data={"username": username},
+                       files={"file": (filename, io.BytesIO(content.encode()), "text/csv")})
+
+
+def test_upload_is_ingested_then_deduplicated():
+    content = CSV + f"west,{uuid.uuid4().int % 1000}\n"
+    first = upload(content)
+    assert first.status_code == 200
+    body = first.json()
+    assert body["row_count"] == 4 and not body["deduplicated"]
+    assert body["filled_null_columns"] == ["sales"]
+    second = upload(content, filename="copy.csv").json()
+    assert second["deduplicated"] and second["content_hash"] == body["content_hash"]
+    assert second["preview"] == body["preview"]
+
+
+def test_only_csv_files_are_accepted():
+    assert upload(CSV, filename="sales.xlsx").status_code == 400
+
+
+def test_receive_hashes_while_copying(tmp_path):
+    store = BlobStore(tmp_path)
+    temp_path, content_hash, size = store.receive(io.BytesIO(b"a,b\n1,2\n"))
+    assert size == 8 and temp_path.read_bytes() == b"a,b\n1,2\n"
+    path = store.store(temp_path, content_hash)
+    assert path == store.path_for(content_hash) and path.exists()
+
+
+def test_ingest_locks_are_a_fixed_set(tmp_path):
+    store = BlobStore(tmp_path)
+    for _ in range(10 * LOCK_STRIPES):
+        with store.lock(uuid.uuid4().hex):
+            pass
+    assert len(store._locks) == LOCK_STRIPES
+
+
+def test_same_content_is_ingested_one_at_a_time(tmp_path):
+    store = BlobStore(tmp_path)
+    content_hash = uuid.uuid4().hex
+    inside, overlaps = [], []
+
+    def ingest():
+        with store.lock(content_hash):
+            overlaps.append(bool(inside))
+            inside.append(1)
+            threading.Event().wait(0.01)
+            inside.pop()
+
+    threads = [threading.Thread(target=ingest) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == [False] * 8
+
+
+HOLD_LOCK = """
+import sys
+from backend.core.blob_store import BlobStore
+with BlobStore(sys.argv[1]).lock(sys.argv[2]):
+    print("locked", flush=True)
+    sys.stdin.read()
+"""
+
+
+def test_same_content_is_ingested_one_process_at_a_time(tmp_path):
+    store = BlobStore(tmp_path)
+    content_hash = uuid.uuid4().hex
+    env = {**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+    holder = subprocess.Popen([sys.executable, "-c", HOLD_LOCK, str(tmp_path), content_hash],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        acquired = threading.Event()
+
+        def ingest():
+            with store.lock(content_hash):
+                acquired.set()
+
+        thread = threading.Thread(target=ingest)
+        thread.start()
+        assert not acquired.wait(0.3)
+        holder.stdin.close()
+        assert acquired.wait(10)
+        thread.join()
+    finally:
+        holder.kill()
+        holder.wait()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.core.variable_store import SessionVariableStore, referenced_names, sizeof
+
+
+def frame(columns):
+    return pd.DataFrame(np.arange(1000 * len(columns)).reshape(1000, len(columns)), columns=columns)
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Room for one 1000x2 frame, so storing a second spills the first
+    return SessionVariableStore(max_bytes=20_000, idle_ttl_seconds=3600, spill_dir=str(tmp_path))
+
+
+def test_referenced_names():
+    assert referenced_names("x = df['a'] + total\nprint(x)") >= {"x", "df", "total", "print"}
+    assert referenced_names("x = (") == set()
+
+
+def test_load_returns_only_requested_names(store):
+    store.update("s", {"a": 1, "b": 2})
+    assert store.load("s", {"a"}) == {"a": 1}
+    assert store.load("s") == {"a": 1, "b": 2}
+    assert store.load("other") == {}
+
+
+@pytest.mark.parametrize("columns", [
+    ["a", "b"],
+    [0, 1],
+    pd.MultiIndex.from_tuples([("x", "a"), ("x", "b")]),
+    ["a", "a"],
+])
+def test_spilled_frames_come_back_unchanged(store, columns):
+    original = frame(columns)
+    store.update("s", {"first": original.copy()})
+    store.update("s", {"second": frame(["c", "d"])})
+    assert store.stats()["spills"] == 1
+    reloaded = store.load("s", {"first"})["first"]
+    assert store.stats()["reloads"] == 1
+    pd.testing.assert_frame_equal(reloaded, original)
+
+
+def test_other_sessions_are_evicted_first(store):
+    store.update("old", {"df": frame(["a", "b"])})
+    store.update("new", {"df": frame(["a", "b"])})
+    assert store.load("new", {"df"})["df"] is not None
+    assert store.stats()["spills"] == 1
+    assert store.current_bytes <= store.max_bytes
+
+
+def test_values_that_cannot_spill_are_dropped(tmp_path):
+    store = SessionVariableStore(max_bytes=20_000, idle_ttl_seconds=3600, spill_dir=None)
+    store.update("s", {"first": frame(["a", "b"])})
+    store.update("s", {"second": frame(["c", "d"])})
+    assert store.names("s") == ["second"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire(tmp_path):
+    store = SessionVariableStore(max_bytes=10 ** 9, idle_ttl_seconds=0, spill_dir=str(tmp_path))
+    store.update("idle", {"x": 1})
+    store.update("active", {"y": 2})
+    assert store.names("idle") == []
+    assert store.stats()["expired_sessions"] == 1
+
+
+def test_in_place_changes_are_remeasured_and_refingerprinted(store):
+    df = frame(["a", "b"])
+    store.update("s", {"df": df})
+    before = store.fingerprints("s", {"df"})["df"]
+    df["c"] = df["a"]
+    store.update("s", {"df": df})
+    assert store.fingerprints("s", {"df"})["df"] != before
+    assert store.current_bytes == sizeof(df)